@@ -0,0 +1,239 @@
+"""
+Randomized algebraic computation of the maximum matching size, following Lovász, and of a maximum matching.
+
+A pair of edges with incidence vectors b and c gives the skew-symmetric matrix x (b c^T - c b^T), x being random.
+Over a large prime field, the rank of the sum of these matrices is twice the maximum amount of pairs of a matching,
+that is the size of a maximum matching (in elements), with probability at least 1 - n/p. It is never larger.
+
+`maximum_matching` is an engine independent of the dependency graph, following Cheung, Lau and Leung:
+the matrix is restricted to a nonsingular principal submatrix of maximum rank and inverted, then each pair
+is removed if the matrix stays nonsingular without it. This test only reads a 2x2 block of the inverse,
+and a removal updates the inverse in quadratic time (Woodbury). The engine thus needs O(n^2) memory and
+O(m n^2) time, n being the amount of vertices and m the amount of pairs: it is an optional engine for dense
+instances only, with at least as many pairs as vertices, on which its matrix is smaller than the dependency graph.
+It is not the graphic matroid parity algorithm of Gabow and Stallmann working on spanning trees,
+which is not implemented. It needs NumPy.
+
+The rank is computed with NumPy when it is installed, otherwise in pure Python, which is only fast enough
+for small instances.
+"""
+
+import contextlib
+import random
+import warnings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import base_graph
+import metrics as mt
+import union_find as uf
+
+# Prime below 2^31, so that a product of two residues, or the sum of two of them, fits in a signed 64 bits integer
+PRIME = 2**31 - 1
+# Each attempt of `maximum_matching` fails with probability at most n/p
+MAX_ATTEMPTS = 3
+
+
+def _pair_vectors_(graph: base_graph.BaseGraph, seed: int = None, prime: int = PRIME) -> tuple[int, list[tuple[list, list, int]]]:
+    """
+    The dimension of the incidence vectors and, for each pair in pair id order, the sparse incidence vectors of its edges
+    (lists of index and sign) and its random value. Pair ids need not be consecutive (see `dynamic.DynamicSolver`).
+
+    One vertex of each connected component is dropped from the incidence vectors: they sum to zero on a component,
+    so this keeps the rank while reducing the dimension.
+    """
+    rng = random.Random(seed)
+    components = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    for u, v in zip(graph.tails, graph.heads):
+        uf.uf_union(components, u, v, rank)
+    index: dict[int, int] = {}
+    for v in graph.nodes():
+        if uf.uf_find(components, v) != v:
+            index[v] = len(index)
+
+    def incidence(edge: base_graph.BaseEdge) -> list[tuple[int, int]]:
+        if edge[0] == edge[1]:
+            return []
+        return [(index[w], sign) for w, sign in ((edge[0], 1), (edge[1], -1)) if w in index]
+
+    edges = graph.elements
+    return len(index), [(incidence(edges[2*pair_id]), incidence(edges[2*pair_id+1]), rng.randrange(1, prime)) for pair_id in sorted({element_id // 2 for element_id in edges})]
+
+
+def lovasz_matrix(graph: base_graph.BaseGraph, seed: int = None, prime: int = PRIME) -> list[list[int]]:
+    """
+    Builds the random skew-symmetric matrix of the pairs, modulo the prime.
+    """
+    return _matrix_(*_pair_vectors_(graph, seed, prime), prime)
+
+
+def _matrix_(size: int, vectors: list[tuple[list, list, int]], prime: int) -> list[list[int]]:
+    matrix = [[0] * size for _ in range(size)]
+    for b, c, x in vectors:
+        for i, si in b:
+            for j, sj in c:
+                matrix[i][j] = (matrix[i][j] + x*si*sj) % prime
+                matrix[j][i] = (matrix[j][i] - x*si*sj) % prime
+    return matrix
+
+
+def _pivots_python_(matrix: list[list[int]], prime: int) -> list[int]:
+    """
+    The pivot columns of the row echelon form of the matrix, which index a basis of its columns.
+    """
+    rows = [row for row in matrix if any(row)]
+    pivots: list[int] = []
+    for col in range(len(matrix)):
+        rank = len(pivots)
+        pivot = next((i for i in range(rank, len(rows)) if rows[i][col] != 0), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        inverse = pow(rows[rank][col], prime - 2, prime)
+        pivot_row = [value * inverse % prime for value in rows[rank]]
+        rows[rank] = pivot_row
+        for i in range(rank + 1, len(rows)):
+            factor = rows[i][col]
+            if factor != 0:
+                rows[i] = [(a - factor * b) % prime for a, b in zip(rows[i], pivot_row)]
+        pivots.append(col)
+        if len(pivots) == len(rows):
+            break
+    return pivots
+
+
+def _pivots_numpy_(matrix: list[list[int]], prime: int) -> list[int]:
+    rows = numpy.array(matrix, dtype=numpy.int64).reshape(len(matrix), len(matrix))
+    pivots: list[int] = []
+    for col in range(rows.shape[1]):
+        rank = len(pivots)
+        nonzero = numpy.flatnonzero(rows[rank:, col])
+        if len(nonzero) == 0:
+            continue
+        pivot = rank + nonzero[0]
+        rows[[rank, pivot]] = rows[[pivot, rank]]
+        rows[rank] = rows[rank] * pow(int(rows[rank, col]), prime - 2, prime) % prime
+        below = rank + 1 + numpy.flatnonzero(rows[rank+1:, col])
+        rows[below] = (rows[below] - numpy.outer(rows[below, col], rows[rank]) % prime) % prime
+        pivots.append(col)
+        if len(pivots) == rows.shape[0]:
+            break
+    return pivots
+
+
+def _inverse_numpy_(matrix: list[list[int]], prime: int):
+    size = len(matrix)
+    rows = numpy.concatenate([numpy.array(matrix, dtype=numpy.int64).reshape(size, size), numpy.eye(size, dtype=numpy.int64)], axis=1)
+    product = numpy.empty_like(rows)
+    for col in range(size):
+        pivot = col + numpy.flatnonzero(rows[col:, col])[0]
+        rows[[col, pivot]] = rows[[pivot, col]]
+        rows[col] = rows[col] * pow(int(rows[col, col]), prime - 2, prime) % prime
+        pivot_row = rows[col].copy()
+        # Every row is reduced in place, then the pivot row restored
+        numpy.multiply.outer(rows[:, col], pivot_row, out=product)
+        product %= prime
+        rows -= product
+        rows %= prime
+        rows[col] = pivot_row
+    return rows[:, size:].copy()
+
+
+def _rank_python_(matrix: list[list[int]], prime: int) -> int:
+    return len(_pivots_python_(matrix, prime))
+
+
+def _rank_numpy_(matrix: list[list[int]], prime: int) -> int:
+    return len(_pivots_numpy_(matrix, prime))
+
+
+def rank_mod_prime(matrix: list[list[int]], prime: int = PRIME) -> int:
+    if numpy is not None:
+        return _rank_numpy_(matrix, prime)
+    return _rank_python_(matrix, prime)
+
+
+def optimum_size(graph: base_graph.BaseGraph, seed: int = None, prime: int = PRIME) -> int:
+    """
+    The size of a maximum matching, in elements as `len(matching)`, without computing one.
+    It is correct with probability at least 1 - n/p, and otherwise too small.
+    """
+    return rank_mod_prime(lovasz_matrix(graph, seed, prime), prime)
+
+
+def _update_numpy_(inverse, b: list, c: list, x: int, m_inverse: list[list[int]], prime: int):
+    p0 = sum(sign * inverse[:, i] for i, sign in b) % prime * x % prime
+    p1 = sum(sign * inverse[:, i] for i, sign in c) % prime * x % prime
+    l0 = (p0 * m_inverse[0][0] % prime + p1 * m_inverse[1][0] % prime) % prime
+    l1 = (p0 * m_inverse[0][1] % prime + p1 * m_inverse[1][1] % prime) % prime
+    top = sum(sign * inverse[i, :] for i, sign in c) % prime
+    bottom = -sum(sign * inverse[i, :] for i, sign in b) % prime
+    inverse[:] = (inverse + numpy.outer(l0, top) % prime + numpy.outer(l1, bottom) % prime) % prime
+
+
+def _try_removal_(inverse, b: list, c: list, x: int, prime: int) -> bool:
+    """
+    Removes the matrix x (b c^T - c b^T) of a pair from the inverted matrix N if the result is still nonsingular.
+
+    It is U V^T with U = x [b c] and V = [c -b], so the result is nonsingular if and only if I - V^T N U is,
+    which only reads the entries of N on the endpoints of the pair. Its inverse is then N + N U (I - V^T N U)^-1 V^T N.
+    """
+    def form(left: list, right: list) -> int:
+        return sum(sl * sr * int(inverse[i][j]) for i, sl in left for j, sr in right) % prime
+
+    m = [[(1 - x * form(c, b)) % prime, -x * form(c, c) % prime],
+         [x * form(b, b) % prime, (1 + x * form(b, c)) % prime]]
+    determinant = (m[0][0] * m[1][1] - m[0][1] * m[1][0]) % prime
+    if determinant == 0:
+        return False
+    d = pow(determinant, prime - 2, prime)
+    m_inverse = [[m[1][1] * d % prime, -m[0][1] * d % prime], [-m[1][0] * d % prime, m[0][0] * d % prime]]
+    _update_numpy_(inverse, b, c, x, m_inverse, prime)
+    return True
+
+
+def maximum_matching(graph: base_graph.BaseGraph, seed: int = None, prime: int = PRIME, metrics: mt.Metrics = None) -> list[int]:
+    """
+    Computes a maximum matching without the dependency graph, see the module documentation.
+
+    The pairs left after the removals are a maximum matching with probability at least 1 - n/p.
+    Otherwise they are detected not to form a matching of the computed size, and the removals are redone
+    with other random values, at most MAX_ATTEMPTS times in all, so the result is always a valid matching,
+    too small with probability at most n/p. Raises a RuntimeError without NumPy, or if every attempt fails,
+    and issues a RuntimeWarning on a sparse instance, with fewer pairs than vertices.
+    The time spent inverting the matrix and removing pairs is recorded in `metrics`, if given.
+    """
+    if numpy is None:
+        raise RuntimeError('the algebraic engine needs NumPy')
+    if len(graph.elements) // 2 < graph.vertex_count:
+        warnings.warn('the algebraic engine is meant for dense instances: with fewer pairs than vertices, its matrix is larger than the dependency graph', RuntimeWarning)
+    timer = metrics.timer if metrics is not None else lambda phase: contextlib.nullcontext()
+    rng = random.Random(seed)
+    pair_ids = sorted({element_id // 2 for element_id in graph.elements})
+    for _ in range(MAX_ATTEMPTS):
+        with timer('algebraic_inverse'):
+            size, vectors = _pair_vectors_(graph, rng.randrange(prime), prime)
+            matrix = _matrix_(size, vectors, prime)
+            pivots = _pivots_numpy_(matrix, prime)
+            # For a skew-symmetric matrix, the principal submatrix on a basis of the columns is nonsingular
+            position = {row: i for i, row in enumerate(pivots)}
+            inverse = _inverse_numpy_([[matrix[i][j] for j in pivots] for i in pivots], prime)
+
+        with timer('algebraic_removals'):
+            kept: list[int] = []
+            for pair_id, (b, c, x) in zip(pair_ids, vectors):
+                b = [(position[i], sign) for i, sign in b if i in position]
+                c = [(position[i], sign) for i, sign in c if i in position]
+                if b and c and not _try_removal_(inverse, b, c, x, prime):
+                    kept.append(pair_id)
+
+        matching = [element_id for pair_id in kept for element_id in (2*pair_id, 2*pair_id+1)]
+        if len(matching) == len(pivots) and graph.get_spanning_forest(matching) is not None:
+            return matching
+        if metrics is not None:
+            metrics.count('algebraic_retry')
+    raise RuntimeError(f'the algebraic engine found no matching of the computed size in {MAX_ATTEMPTS} attempts')
@@ -1,4 +1,4 @@
-import networkx as nx
+from array import array
 
 import union_find as uf
 
@@ -8,59 +8,161 @@ PAIR_ID_KEY = 'PAIR_ID_KEY'
 BaseEdge = tuple[int, int, dict[str, int]]
 
 
+def build_csr(vertex_count: int, tails: array, heads: array) -> tuple[array, array]:
+    """
+    Builds a compressed sparse row incidence structure of the edges given by their endpoints.
+
+    Returns the offsets, such that the edges incident to v are the slots `slots[offsets[v]:offsets[v+1]]`,
+    and the slots (indices of the edges in `tails` and `heads`). A loop appears once in the incidences of its vertex.
+    """
+    offsets = array('q', bytes(8 * (vertex_count + 1)))
+    for i in range(len(tails)):
+        offsets[tails[i] + 1] += 1
+        if heads[i] != tails[i]:
+            offsets[heads[i] + 1] += 1
+    for v in range(vertex_count):
+        offsets[v + 1] += offsets[v]
+    
+    fill = offsets[:-1]
+    slots = array('q', bytes(8 * offsets[vertex_count]))
+    for i in range(len(tails)):
+        slots[fill[tails[i]]] = i
+        fill[tails[i]] += 1
+        if heads[i] != tails[i]:
+            slots[fill[heads[i]]] = i
+            fill[heads[i]] += 1
+    return offsets, slots
+
+
 class BaseGraph:
     """
-    This class is used as an interface with `networkx`,
-    in the perspective of providing a library-less graph implementation.
+    This class is a compact multigraph implementation.
 
-    You should not use self.nx_instance if possible.
+    Edges are stored in parallel integer arrays (endpoints, element ids and pair ids),
+    and the incidences of the vertices in a CSR structure built on demand.
     """
     def __init__(self):
-        self.nx_instance: nx.MultiGraph = None
-        self.elements: dict[int, BaseEdge] = {}
+        self.tails = array('q')
+        self.heads = array('q')
+        self.element_ids = array('q')
+        self.pair_ids = array('q')
+        self.vertex_count = 0
+
         self.max_element_id = 0
+
+        self._edges: list[BaseEdge] = None
+        self._elements: dict[int, BaseEdge] = None
+        self._csr: tuple[array, array] = None
     
-    def init_instance(self, nx_instance=None):
-        if not nx_instance:
-            self.nx_instance = nx.MultiGraph()
-        else:
-            self.nx_instance = nx_instance
+    def init_instance(self):
+        self.__init__()
     
+    def _invalidate_(self):
+        self._edges = None
+        self._elements = None
+        self._csr = None
+
     def add_edge(self, u: int, v: int, edge_id: int):
-        self.nx_instance.add_edge(u, v, ELEMENT_ID_KEY=edge_id, PAIR_ID_KEY=(edge_id)//2)
-        self.elements[edge_id] = (u, v, {ELEMENT_ID_KEY: edge_id, PAIR_ID_KEY: (edge_id)//2})
+        self.tails.append(u)
+        self.heads.append(v)
+        self.element_ids.append(edge_id)
+        self.pair_ids.append((edge_id)//2)
+        self.vertex_count = max(self.vertex_count, u+1, v+1)
         self.max_element_id = max(edge_id, self.max_element_id)
+        self._invalidate_()
+    
+    def add_edges(self, tails: array, heads: array):
+        """
+        Adds edges in bulk, given by their endpoints. Their ids follow the ones already in the graph.
+        """
+        first_id = len(self.tails)
+        self.tails.extend(tails)
+        self.heads.extend(heads)
+        self.element_ids.extend(range(first_id, first_id + len(tails)))
+        if first_id % 2 == 0 and len(tails) % 2 == 0:
+            # Each pair id twice, interleaving the range of pair ids with itself
+            pair_ids = array('q', range(first_id // 2, (first_id + len(tails)) // 2))
+            doubled = array('q', bytes(16 * len(pair_ids)))
+            doubled[0::2] = pair_ids
+            doubled[1::2] = pair_ids
+            self.pair_ids.extend(doubled)
+        else:
+            self.pair_ids.extend(i//2 for i in range(first_id, first_id + len(tails)))
+        if len(tails) > 0:
+            self.vertex_count = max(self.vertex_count, max(tails)+1, max(heads)+1)
+        self.max_element_id = max(self.max_element_id, len(self.tails) - 1)
+        self._invalidate_()
+
+    def remove_edges(self, element_ids: set[int]):
+        """
+        Removes the edges with the given element ids. The other edges keep their ids, and `max_element_id`
+        is kept, so that ids are never reused.
+        """
+        kept = [i for i, element_id in enumerate(self.element_ids) if element_id not in element_ids]
+        self.tails = array('q', (self.tails[i] for i in kept))
+        self.heads = array('q', (self.heads[i] for i in kept))
+        self.element_ids = array('q', (self.element_ids[i] for i in kept))
+        self.pair_ids = array('q', (self.pair_ids[i] for i in kept))
+        self._invalidate_()
+
+    def _incidences_(self) -> tuple[array, array]:
+        if self._csr is None:
+            self._csr = build_csr(self.vertex_count, self.tails, self.heads)
+        return self._csr
     
     def edges(self) -> list[BaseEdge]:
-        return list(self.nx_instance.edges(data=True))
+        """
+        The edges, in insertion order. They are materialized from the arrays when first requested,
+        the list returned is shared and must not be modified.
+        """
+        if self._edges is None:
+            self._edges = [(u, v, {ELEMENT_ID_KEY: i, PAIR_ID_KEY: p}) for u, v, i, p in zip(self.tails, self.heads, self.element_ids, self.pair_ids)]
+        return self._edges
+    
+    @property
+    def elements(self) -> dict[int, BaseEdge]:
+        if self._elements is None:
+            self._elements = {edge[2][ELEMENT_ID_KEY]: edge for edge in self.edges()}
+        return self._elements
     
     def nodes(self) -> list[int]:
-        return list(self.nx_instance.nodes())
+        offsets, _ = self._incidences_()
+        return [v for v in range(self.vertex_count) if offsets[v] != offsets[v+1]]
+    
+    def incident_edges(self, v: int) -> list[BaseEdge]:
+        offsets, slots = self._incidences_()
+        edges = self.edges()
+        return [edges[i] for i in slots[offsets[v]:offsets[v+1]]]
     
     def adjacent_edges(self, edge: BaseEdge) -> list[BaseEdge]:
-        return list(self.nx_instance.edges([edge[0], edge[1]], data=True))
+        offsets, slots = self._incidences_()
+        edges = self.edges()
+        result = [edges[i] for i in slots[offsets[edge[0]]:offsets[edge[0]+1]]]
+        if edge[1] != edge[0]:
+            result += [edges[i] for i in slots[offsets[edge[1]]:offsets[edge[1]+1]] if self.tails[i] != edge[0] and self.heads[i] != edge[0]]
+        return result
     
-    def get_spanning_forest(self, matching: list[int] = None) -> None | tuple[list[BaseEdge], list[BaseEdge], dict[int, tuple[int, int]]]:
+    def get_spanning_forest(self, matching: list[int] = None) -> None | tuple[list[BaseEdge], list[BaseEdge], dict[int, tuple[int, int, int]]]:
         """
         Get a spanning maximum forest of the graph, used for completing a matching into a basis.
 
         Returns the forest, the elements not in the forest as well as a rooted representation
         """
-        uf_set = list(range(max(list(self.nx_instance.nodes()))+1))
-        if not matching:
-            matching = []
+        uf_set = list(range(self.vertex_count))
+        rank = [0] * self.vertex_count
+        in_matching = set(matching) if matching else set()
         
         forest = []
         non_forest = []
         
         # Establish the base forest, with no singletons
         for edge in self.edges():
-            if not edge[2][ELEMENT_ID_KEY] in matching:
+            if not edge[2][ELEMENT_ID_KEY] in in_matching:
                 non_forest.append(edge)
             else:
                 if uf.uf_find(uf_set, edge[0]) == uf.uf_find(uf_set, edge[1]):
                     return None # matching has cycle
-                uf.uf_union(uf_set, edge[0], edge[1])
+                uf.uf_union(uf_set, edge[0], edge[1], rank)
                 forest.append(edge)
         
         next_singleton_id = self.max_element_id + 1
@@ -69,40 +171,36 @@ class BaseGraph:
         for edge in self.edges():
             if uf.uf_find(uf_set, edge[0]) == uf.uf_find(uf_set, edge[1]):
                 continue
-            uf.uf_union(uf_set, edge[0], edge[1])
+            uf.uf_union(uf_set, edge[0], edge[1], rank)
             singleton = (edge[0], edge[1], {ELEMENT_ID_KEY: next_singleton_id,  PAIR_ID_KEY: None})
             next_singleton_id = next_singleton_id + 1
             forest.append(singleton)
 
-        # Compute a rooted forest representation by greedily doing Depth-First explorations
-        remaining = self.nodes()
-        edges_remaining = forest[:]
+        return forest, non_forest, self.get_rooted_forest(forest)
+
+    def get_rooted_forest(self, forest: list[BaseEdge]) -> dict[int, tuple[int, int, int]]:
+        """
+        Compute a rooted representation of a spanning forest given by its edges.
+
+        Returns, for every vertex, its parent vertex, the id of the edge leading to it (None for roots)
+        and its depth in its tree, for lowest common ancestor queries.
+        """
+        offsets, slots = build_csr(self.vertex_count, array('q', (e[0] for e in forest)), array('q', (e[1] for e in forest)))
         parent = {}
         stack = []
-        while len(remaining) > 0: # pick a root
-            root = remaining.pop()
-            parent[root] = (root, None)
+        for root in self.nodes(): # pick a root
+            if root in parent:
+                continue
+            parent[root] = (root, None, 0)
             stack.append(root)
             while len(stack) > 0: # do a DFS from that root
                 current = stack.pop()
-                edges_to_remove = []
-                for e in edges_remaining:
-                    if not (e[0] == current or e[1] == current):
-                        continue
+                for i in slots[offsets[current]:offsets[current+1]]:
+                    e = forest[i]
                     endpoint = e[0] if e[1] == current else e[1]
-                    
-                    if endpoint in parent.keys():
+                    if endpoint in parent:
                         continue
-
-                    parent[endpoint] = (current, e[2][ELEMENT_ID_KEY])
+                    parent[endpoint] = (current, e[2][ELEMENT_ID_KEY], parent[current][2] + 1)
                     stack.append(endpoint)
-                    remaining.remove(endpoint)
-                    edges_to_remove.append(e)
-                for e in edges_to_remove:
-                    edges_remaining.remove(e)
-
-        return forest, non_forest, parent
 
-            
-
-        
+        return parent
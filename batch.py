@@ -0,0 +1,109 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import input_parsing
+import binary_format
+import solver
+import metrics
+import certificate
+
+"""
+Batch solving of many instances over a process pool, writing one JSON line per instance.
+
+    python batch.py test_input/ 'pascal/*.txt' --workers 4 --timeout 60
+    python batch.py test_input/ --certify
+"""
+
+def list_instances(patterns: list[str]) -> list[str]:
+    """
+    Expands the directories (all their files) and glob patterns given, keeping the order and without duplicates.
+    """
+    paths: list[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths += sorted(os.path.join(pattern, name) for name in os.listdir(pattern) if os.path.isfile(os.path.join(pattern, name)))
+        else:
+            paths += sorted(glob.glob(pattern)) or [pattern]
+    return list(dict.fromkeys(paths))
+
+
+def _on_timeout_(signum, frame):
+    raise TimeoutError()
+
+
+def solve_instance(path: str, timeout: float = None, stats: bool = False, certify: bool = False) -> dict:
+    """
+    Solves an instance file, returns the result as a JSON-serializable dictionary.
+    The timeout (in seconds) relies on SIGALRM, thus is ignored on platforms without it.
+    With `stats`, the solver metrics are added to the result.
+    With `certify`, the result tells whether the certificate of the final search proves the matching maximum.
+    Errors, including unexpected exceptions of the solver, are reported in the `error` field of the result.
+    """
+    result = {'instance': path}
+    start = time.perf_counter()
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_timeout_)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    solver_metrics = metrics.Metrics() if stats else None
+    augmentations = 0
+    def on_augment(matching: list[int]):
+        nonlocal augmentations
+        augmentations += 1
+    try:
+        graph, matching = input_parsing.read_base_graph_from_file(path)
+        certificates = []
+        matching = solver.solve(graph, matching, on_augment=on_augment, metrics=solver_metrics, on_certificate=certificates.append if certify else None)
+        result['matching'] = matching
+        result['size'] = len(matching)
+        result['valid'] = graph.get_spanning_forest(matching) is not None
+        if certify:
+            result['proven'] = certificate.verify(graph, matching, certificates[0])
+    except TimeoutError:
+        result['error'] = 'timeout'
+    except (OSError, input_parsing.InputError, binary_format.FormatError) as error:
+        result['error'] = str(error)
+    # Any other failure is reported on the line of its instance, instead of aborting the batch
+    except Exception as error:
+        result['error'] = f'{type(error).__name__}: {error}'
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    result['augmentations'] = augmentations
+    result['time'] = time.perf_counter() - start
+    if solver_metrics is not None:
+        result['stats'] = solver_metrics.to_dict()
+    return result
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Solves many Graphic Matroid Parity instances, writing one JSON line per instance.')
+    parser.add_argument('instances', nargs='+', help='instance files, directories or glob patterns')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='amount of worker processes (default: CPU count)')
+    parser.add_argument('--timeout', type=float, default=None, help='time limit per instance, in seconds')
+    parser.add_argument('--stats', action='store_true', help='add the solver event counters and phase timings to the results')
+    parser.add_argument('--certify', action='store_true', help='check that the certificate of the final search proves each matching maximum')
+    parser.add_argument('-o', '--output', default='-', help='JSONL output file (default: stdout)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    paths = list_instances(arguments.instances)
+    output = sys.stdout if arguments.output == '-' else open(arguments.output, 'w')
+
+    with ProcessPoolExecutor(max_workers=arguments.workers) as executor:
+        futures = [executor.submit(solve_instance, path, arguments.timeout, arguments.stats, arguments.certify) for path in paths]
+        for future in as_completed(futures):
+            output.write(json.dumps(future.result()) + '\n')
+            output.flush()
+
+    if output is not sys.stdout:
+        output.close()
@@ -0,0 +1,3 @@
+"""
+Benchmarks of the solver: seeded instance generators (`generators`) and a runner timing each phase (`run`).
+"""
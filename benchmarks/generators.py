@@ -0,0 +1,94 @@
+"""
+Seeded generators of instance families, of a size controlled by a single parameter n.
+
+Every generator returns a BaseGraph whose edges 2k and 2k+1 form pair k.
+"""
+
+import random
+from array import array
+
+import base_graph
+
+
+def _graph_(tails: list[int], heads: list[int]) -> base_graph.BaseGraph:
+    graph = base_graph.BaseGraph()
+    graph.add_edges(array('q', tails), array('q', heads))
+    return graph
+
+
+def _pair_randomly_(edges: list[tuple[int, int]], rng: random.Random) -> base_graph.BaseGraph:
+    """
+    Makes pairs out of the given edges in a random order (the last edge is dropped if they are odd).
+    """
+    rng.shuffle(edges)
+    if len(edges) % 2 != 0:
+        edges.pop()
+    return _graph_([e[0] for e in edges], [e[1] for e in edges])
+
+
+def sparse_random(n: int, seed: int = 0) -> base_graph.BaseGraph:
+    """
+    n vertices and n random pairs (2n edges, average degree 4), with parallel edges and loops.
+    """
+    rng = random.Random(seed)
+    return _graph_([rng.randrange(n) for _ in range(2*n)], [rng.randrange(n) for _ in range(2*n)])
+
+
+def dense(n: int, seed: int = 0) -> base_graph.BaseGraph:
+    """
+    The complete graph on n vertices, its edges paired randomly.
+    """
+    rng = random.Random(seed)
+    return _pair_randomly_([(u, v) for u in range(n) for v in range(u+1, n)], rng)
+
+
+def grid(n: int, seed: int = 0) -> base_graph.BaseGraph:
+    """
+    The n x n grid graph, its edges paired randomly.
+    """
+    rng = random.Random(seed)
+    edges = []
+    for i in range(n):
+        for j in range(n):
+            if i+1 < n:
+                edges.append((i*n + j, (i+1)*n + j))
+            if j+1 < n:
+                edges.append((i*n + j, i*n + j + 1))
+    return _pair_randomly_(edges, rng)
+
+
+def long_path(n: int, seed: int = 0) -> base_graph.BaseGraph:
+    """
+    A path on n vertices whose edges are paired with random chords, so that the spanning forest is deep
+    and the fundamental cycles are long.
+    """
+    rng = random.Random(seed)
+    tails: list[int] = []
+    heads: list[int] = []
+    for i in range(n-1):
+        tails += [i, rng.randrange(n)]
+        heads += [i+1, rng.randrange(n)]
+    return _graph_(tails, heads)
+
+
+def deep_blossom(n: int, seed: int = 0) -> base_graph.BaseGraph:
+    """
+    A strip of n triangles, triangle i being on vertices i, i+1 and i+2, where the first and the last edge
+    of each triangle are paired with the same edge of the next triangle. The searches on it merge
+    a quadratic amount of blossoms. The seed only shuffles the vertex numbering.
+    """
+    rng = random.Random(seed)
+    vertices = list(range(n + 2))
+    rng.shuffle(vertices)
+    triangles = [[(vertices[i], vertices[i+1]), (vertices[i+1], vertices[i+2]), (vertices[i+2], vertices[i])] for i in range(n)]
+    edges = [triangles[i+k][j] for i in range(n-1) for j in (0, 2) for k in (0, 1)]
+    return _graph_([e[0] for e in edges], [e[1] for e in edges])
+
+
+FAMILIES = {
+    'sparse': sparse_random,
+    'dense': dense,
+    'grid': grid,
+    'path': long_path,
+    'blossom': deep_blossom,
+}
@@ -0,0 +1,179 @@
+"""
+Benchmark runner: times each phase of the solver on generated instances of increasing sizes.
+
+    python -m benchmarks.run --families sparse,path --save before
+    python -m benchmarks.run --families sparse,path --compare before
+
+Phases are the parsing of the instance in the stsh format, the spanning forest, the dependency graph,
+and each augmenting search (`improve_matching`) and dependency graph update (`rebase`).
+Baselines are saved in `benchmarks/baselines/<name>.json`; comparing to one reports the phases
+slower than the baseline by more than the threshold, and exits with status 1 if there are any.
+With `--cross-check`, each instance is also solved by the algebraic engine (`algebraic.maximum_matching`, needing NumPy),
+which is timed, and the run exits with status 1 if the matching sizes differ.
+With `--certify`, the certificate of the final search of each instance (`Solver.dual_certificate`) is timed
+and verified, and the run exits with status 1 if one does not prove the matching maximum.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import algebraic
+import certificate
+import input_parsing
+import dependency_graph
+import solver
+from benchmarks import generators
+
+BASELINES_DIRECTORY = os.path.join(os.path.dirname(__file__), 'baselines')
+
+DEFAULT_SIZES = {
+    'sparse': [200, 400, 800],
+    'dense': [10, 20, 30],
+    'grid': [5, 10, 15],
+    'path': [200, 400, 800],
+    'blossom': [20, 40, 80],
+}
+
+PHASES = ['parse', 'forest', 'dependency_graph', 'improve_matching', 'rebase', 'total']
+
+
+def _timed_(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run_instance(family: str, n: int, seed: int, cross_check: bool = False, certify: bool = False) -> dict:
+    graph = generators.FAMILIES[family](n, seed)
+    text = input_parsing.format_stsh(graph)
+
+    (graph, matching), parse = _timed_(input_parsing.parse_stsh, text)
+    _, forest = _timed_(graph.get_spanning_forest, matching)
+    dep_graph, dep_graph_time = _timed_(dependency_graph.DependencyGraph, graph, matching)
+
+    sol = solver.Solver(dep_graph)
+    searches: list[float] = []
+    rebases: list[float] = []
+    while True:
+        improved, search = _timed_(sol.improve_matching)
+        searches.append(search)
+        if not improved:
+            break
+        _, rebase = _timed_(dep_graph.rebase, graph)
+        rebases.append(rebase)
+        sol.reset()
+
+    record = {
+        'family': family,
+        'n': n,
+        'seed': seed,
+        'edges': len(graph.tails),
+        'size': len(dep_graph.get_matching_from_basis()),
+        'augmentations': len(rebases),
+        'parse': parse,
+        'forest': forest,
+        'dependency_graph': dep_graph_time,
+        'improve_matching': sum(searches),
+        'last_improve_matching': searches[-1],
+        'rebase': sum(rebases),
+        'total': parse + forest + dep_graph_time + sum(searches) + sum(rebases),
+    }
+    if cross_check:
+        matching, record['algebraic_engine'] = _timed_(algebraic.maximum_matching, graph, seed)
+        record['algebraic_size'] = len(matching)
+    if certify:
+        dual, record['certificate'] = _timed_(sol.dual_certificate, graph)
+        record['proven'] = certificate.verify(graph, dep_graph.get_matching_from_basis(), dual)
+    return record
+
+
+def run(families: list[str], sizes: list[int] | None, seed: int, repeat: int, cross_check: bool = False, certify: bool = False) -> list[dict]:
+    """
+    Runs the benchmarks, keeping the fastest of `repeat` runs for each phase.
+    """
+    records = []
+    for family in families:
+        for n in sizes or DEFAULT_SIZES[family]:
+            runs = [run_instance(family, n, seed, cross_check, certify) for _ in range(repeat)]
+            record = runs[0]
+            for phase in PHASES + ['last_improve_matching'] + (['algebraic_engine'] if cross_check else []) + (['certificate'] if certify else []):
+                record[phase] = min(r[phase] for r in runs)
+            records.append(record)
+            print(format_record(record), file=sys.stderr)
+    return records
+
+
+def format_record(record: dict) -> str:
+    return (f"{record['family']:>8} n={record['n']:<6} edges={record['edges']:<7} size={record['size']:<7} aug={record['augmentations']:<5} "
+            + ' '.join(f'{phase}={record[phase]:.4f}' for phase in PHASES)
+            + (f" algebraic_engine={record['algebraic_engine']:.4f}" if 'algebraic_engine' in record else '')
+            + (f" certificate={record['certificate']:.4f}" if 'certificate' in record else ''))
+
+
+def compare(records: list[dict], baseline: list[dict], threshold: float) -> list[str]:
+    """
+    The phases of the records slower than in the baseline by more than the threshold (a ratio).
+    Phases taking less than a millisecond are ignored, their timing being mostly noise.
+    """
+    reference = {(r['family'], r['n'], r['seed']): r for r in baseline}
+    regressions = []
+    for record in records:
+        base = reference.get((record['family'], record['n'], record['seed']))
+        if base is None:
+            continue
+        for phase in PHASES:
+            if record[phase] > 1e-3 and record[phase] > threshold * base[phase]:
+                regressions.append(f"{record['family']} n={record['n']} {phase}: {base[phase]:.4f}s -> {record[phase]:.4f}s ({record[phase] / max(base[phase], 1e-9):.2f}x)")
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Times each phase of the solver on generated instances.')
+    parser.add_argument('--families', default=','.join(generators.FAMILIES), help='comma-separated families (default: all)')
+    parser.add_argument('--sizes', default=None, help='comma-separated sizes, overriding the defaults of the families')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='runs per instance, the fastest is kept')
+    parser.add_argument('--save', metavar='NAME', help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='NAME', help='compare the results to a saved baseline')
+    parser.add_argument('--cross-check', action='store_true', help='also solve each instance with the algebraic engine and compare the sizes')
+    parser.add_argument('--certify', action='store_true', help='also verify that the certificate of the final search proves each matching maximum')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression (default: 1.25)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    families = arguments.families.split(',')
+    for family in families:
+        if family not in generators.FAMILIES:
+            sys.exit(f'unknown family {family}, expected one of: {", ".join(generators.FAMILIES)}')
+    sizes = [int(n) for n in arguments.sizes.split(',')] if arguments.sizes else None
+    if arguments.cross_check and algebraic.numpy is None:
+        sys.exit('--cross-check needs NumPy')
+
+    records = run(families, sizes, arguments.seed, arguments.repeat, arguments.cross_check, arguments.certify)
+    print(json.dumps(records, indent=1))
+
+    mismatches = [r for r in records if 'algebraic_size' in r and r['algebraic_size'] != r['size']]
+    for record in mismatches:
+        print('MISMATCH', f"{record['family']} n={record['n']}: size {record['size']}, algebraic engine {record['algebraic_size']}", file=sys.stderr)
+    unproven = [r for r in records if r.get('proven') is False]
+    for record in unproven:
+        print('UNPROVEN', f"{record['family']} n={record['n']}: the certificate does not prove size {record['size']} maximum", file=sys.stderr)
+
+    if arguments.save:
+        os.makedirs(BASELINES_DIRECTORY, exist_ok=True)
+        with open(os.path.join(BASELINES_DIRECTORY, arguments.save + '.json'), 'w') as file:
+            json.dump(records, file, indent=1)
+
+    if arguments.compare:
+        with open(os.path.join(BASELINES_DIRECTORY, arguments.compare + '.json')) as file:
+            regressions = compare(records, json.load(file), arguments.threshold)
+        for regression in regressions:
+            print('REGRESSION', regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    if mismatches or unproven:
+        sys.exit(1)
@@ -0,0 +1,143 @@
+"""
+Compact binary formats for instances and solver checkpoints.
+
+Both are a little-endian header followed by packed int32 arrays:
+
+    instance:   magic 'GMPI', version, edge count, matching size | tails | heads | matching
+    checkpoint: magic 'GMPC', version, edge count, matching size, augmentations, instance checksum | matching
+
+Edges are 0-based endpoints, edge 2k and 2k+1 forming pair k, as in `BaseGraph`.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+import base_graph
+
+INSTANCE_MAGIC = b'GMPI'
+CHECKPOINT_MAGIC = b'GMPC'
+VERSION = 1
+
+INSTANCE_HEADER = struct.Struct('<4sIII')
+CHECKPOINT_HEADER = struct.Struct('<4sIIIII')
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _pack_(values) -> bytes:
+    packed = array('i', values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+def _unpack_(buffer, offset: int, count: int) -> array:
+    unpacked = array('i')
+    unpacked.frombytes(buffer[offset:offset + 4*count])
+    if sys.byteorder == 'big':
+        unpacked.byteswap()
+    return unpacked
+
+def _unpack_int64_(view: memoryview, offset: int, count: int) -> array:
+    """
+    Converts packed int32 values to an int64 array, reading them in place from the buffer on little-endian platforms.
+    """
+    if sys.byteorder == 'big':
+        return array('q', _unpack_(view, offset, count))
+    return array('q', view[offset:offset + 4*count].cast('i'))
+
+def _check_matching_(path: str, matching: list[int], edge_count: int):
+    """
+    Raises a FormatError if the matching is not made of whole pairs (edges 2k and 2k+1) of the instance, as `parse_stsh` does.
+    """
+    ordered = sorted(matching)
+    if len(ordered) % 2 != 0 or any(ordered[i] < 0 or ordered[i] % 2 != 0 or ordered[i]+1 != ordered[i+1] or ordered[i+1] >= edge_count
+                                    for i in range(0, len(ordered), 2)):
+        raise FormatError(f'{path}: matching is not made of pairs of the instance')
+
+def _write_atomically_(path: str, data: bytes):
+    """
+    Writes the file through a temporary file, so that an interrupted write never leaves a truncated file.
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def instance_checksum(graph: base_graph.BaseGraph) -> int:
+    return zlib.crc32(_pack_(graph.heads), zlib.crc32(_pack_(graph.tails)))
+
+
+def is_binary_instance(path: str) -> bool:
+    with open(path, 'rb') as file:
+        return file.read(len(INSTANCE_MAGIC)) == INSTANCE_MAGIC
+
+
+def write_instance(path: str, graph: base_graph.BaseGraph, matching: list[int] = None):
+    if not matching:
+        matching = []
+    header = INSTANCE_HEADER.pack(INSTANCE_MAGIC, VERSION, len(graph.tails), len(matching))
+    _write_atomically_(path, header + _pack_(graph.tails) + _pack_(graph.heads) + _pack_(matching))
+
+
+def read_instance(path: str) -> tuple[base_graph.BaseGraph, list[int]]:
+    """
+    Reads an instance through a memory map: the int32 endpoints are converted once from the mapped file
+    to int64 arrays, which are then appended to the graph arrays.
+    Raises a FormatError if the instance is malformed, or if its matching is not made of pairs of the instance.
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if len(buffer) < INSTANCE_HEADER.size:
+            raise FormatError(f'{path}: binary instance is truncated')
+        magic, version, edge_count, matching_count = INSTANCE_HEADER.unpack_from(buffer)
+        if magic != INSTANCE_MAGIC or version != VERSION:
+            raise FormatError(f'{path}: not a binary instance of a supported version')
+        if len(buffer) != INSTANCE_HEADER.size + 4*(2*edge_count + matching_count) or edge_count % 2 != 0:
+            raise FormatError(f'{path}: binary instance is truncated or malformed')
+
+        offset = INSTANCE_HEADER.size
+        with memoryview(buffer) as view:
+            tails = _unpack_int64_(view, offset, edge_count)
+            heads = _unpack_int64_(view, offset + 4*edge_count, edge_count)
+            matching = _unpack_(view, offset + 8*edge_count, matching_count).tolist()
+
+    if edge_count > 0 and min(min(tails), min(heads)) < 0:
+        raise FormatError(f'{path}: binary instance has a negative vertex')
+    _check_matching_(path, matching, edge_count)
+    graph = base_graph.BaseGraph()
+    graph.add_edges(tails, heads)
+    return graph, matching
+
+
+def write_checkpoint(path: str, graph: base_graph.BaseGraph, matching: list[int], augmentations: int):
+    header = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, VERSION, len(graph.tails), len(matching), augmentations, instance_checksum(graph))
+    _write_atomically_(path, header + _pack_(matching))
+
+
+def read_checkpoint(path: str, graph: base_graph.BaseGraph) -> tuple[list[int], int]:
+    """
+    Reads the matching and the amount of augmentations of a checkpoint.
+    Raises a FormatError if the checkpoint was not written for this graph.
+    """
+    with open(path, 'rb') as file:
+        buffer = file.read()
+    if len(buffer) < CHECKPOINT_HEADER.size:
+        raise FormatError(f'{path}: checkpoint is truncated')
+    magic, version, edge_count, matching_count, augmentations, checksum = CHECKPOINT_HEADER.unpack_from(buffer)
+    if magic != CHECKPOINT_MAGIC or version != VERSION:
+        raise FormatError(f'{path}: not a checkpoint of a supported version')
+    if len(buffer) != CHECKPOINT_HEADER.size + 4*matching_count:
+        raise FormatError(f'{path}: checkpoint is truncated or malformed')
+    if edge_count != len(graph.tails) or checksum != instance_checksum(graph):
+        raise FormatError(f'{path}: checkpoint was written for another instance')
+    matching = _unpack_(buffer, CHECKPOINT_HEADER.size, matching_count).tolist()
+    _check_matching_(path, matching, edge_count)
+    return matching, augmentations
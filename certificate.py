@@ -0,0 +1,263 @@
+"""
+Certificates of optimality of a matching, and their verification in near-linear time.
+
+Following the min-max theorem of Lovász, for any set Z of edges of the complete graph on the vertices and any partition
+of the pairs into classes P_1, ..., P_k, a matching has at most r(Z) + sum_i floor((r(Z + P_i) - r(Z)) / 2) pairs,
+r being the rank in the graphic matroid (the size of a spanning forest). Z thus identifies vertices, which need not
+be adjacent: some instances need it for the bound to reach the maximum matching size. A certificate gives Z,
+as pairs of vertices, and the classes, as lists of pair ids: the matching is proven maximum if its amount of pairs
+reaches the bound.
+
+The ranks are computed with a union-find over the vertices in which Z is contracted once, then a union-find
+over the contracted vertices touched by each class, so that checking a certificate takes near-linear time.
+"""
+
+import json
+
+import base_graph
+import binary_format
+import union_find as uf
+
+
+class CertificateError(ValueError):
+    pass
+
+
+class Certificate:
+    def __init__(self, contracted: list[tuple[int, int]], classes: list[list[int]]):
+        self.contracted = contracted
+        self.classes = classes
+
+    def bound(self, graph: base_graph.BaseGraph) -> int:
+        return bound(graph, self)
+
+
+def contract(graph: base_graph.BaseGraph, contracted: list[tuple[int, int]]) -> tuple[list[int], int]:
+    """
+    A union-find over the vertices in which the pairs of vertices are identified, and its rank r(Z).
+    """
+    vertices = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    total = 0
+    for u, v in contracted:
+        u, v = uf.uf_find(vertices, u), uf.uf_find(vertices, v)
+        if u != v:
+            uf.uf_union(vertices, u, v, rank)
+            total += 1
+    return vertices, total
+
+
+def class_rank(graph: base_graph.BaseGraph, vertices: list[int], element_ids) -> int:
+    """
+    The rank of the elements in the graph whose vertices are identified following the union-find,
+    which is r(Z + P) - r(Z) for the elements of a class P.
+    """
+    edges = graph.elements
+    local: dict[int, int] = {}
+    local_rank: dict[int, int] = {}
+    gain = 0
+    for element_id in element_ids:
+        u, v = uf.uf_find(vertices, edges[element_id][0]), uf.uf_find(vertices, edges[element_id][1])
+        for w in (u, v):
+            local.setdefault(w, w)
+            local_rank.setdefault(w, 0)
+        if uf.uf_find(local, u) != uf.uf_find(local, v):
+            uf.uf_union(local, u, v, local_rank)
+            gain += 1
+    return gain
+
+
+def class_elements(pair_ids: list[int]) -> list[int]:
+    """
+    The element ids of the pairs.
+    """
+    return [element_id for pair_id in pair_ids for element_id in (2*pair_id, 2*pair_id+1)]
+
+
+def bound(graph: base_graph.BaseGraph, certificate: Certificate) -> int:
+    """
+    The maximum amount of pairs of a matching allowed by the certificate.
+    """
+    vertices, total = contract(graph, certificate.contracted)
+    for pair_ids in certificate.classes:
+        total += class_rank(graph, vertices, class_elements(pair_ids)) // 2
+    return total
+
+
+def check(graph: base_graph.BaseGraph, matching: list[int], certificate: Certificate) -> int:
+    """
+    Checks that the matching is a forest of whole pairs and that the classes partition the pairs of the graph,
+    raising a CertificateError otherwise. Returns the bound of the certificate.
+    """
+    edges = graph.elements
+    in_matching = set(matching)
+    if len(in_matching) != len(matching):
+        raise CertificateError('the matching has a repeated element')
+    forest = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    for element_id in matching:
+        if element_id not in edges:
+            raise CertificateError(f'the matching has an unknown element {element_id}')
+        if element_id ^ 1 not in in_matching:
+            raise CertificateError(f'the matching has element {element_id} without its pair')
+        u, v = uf.uf_find(forest, edges[element_id][0]), uf.uf_find(forest, edges[element_id][1])
+        if u == v:
+            raise CertificateError(f'the matching has a cycle through element {element_id}')
+        uf.uf_union(forest, u, v, rank)
+
+    for vertices in certificate.contracted:
+        if len(vertices) != 2 or not all(isinstance(v, int) and 0 <= v < graph.vertex_count for v in vertices):
+            raise CertificateError(f'the certificate contracts an unknown pair of vertices {vertices}')
+    pair_ids = {element_id // 2 for element_id in edges}
+    seen: set[int] = set()
+    for pair_ids_of_class in certificate.classes:
+        for pair_id in pair_ids_of_class:
+            if pair_id not in pair_ids:
+                raise CertificateError(f'the certificate has an unknown pair {pair_id}')
+            if pair_id in seen:
+                raise CertificateError(f'the certificate has pair {pair_id} in two classes')
+            seen.add(pair_id)
+    if len(seen) != len(pair_ids):
+        raise CertificateError(f'the certificate misses pair {min(pair_ids - seen)}')
+    return bound(graph, certificate)
+
+
+def verify(graph: base_graph.BaseGraph, matching: list[int], certificate: Certificate) -> bool:
+    """
+    Whether the certificate proves the matching maximum, see `check`.
+    """
+    return check(graph, matching, certificate) == len(matching) // 2
+
+
+def component_certificate(graph: base_graph.BaseGraph) -> Certificate:
+    """
+    The certificate contracting nothing, with a class for the pairs of each connected component.
+    """
+    components = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    for u, v in zip(graph.tails, graph.heads):
+        uf.uf_union(components, u, v, rank)
+    classes: dict[int, list[int]] = {}
+    for element_id, edge in graph.elements.items():
+        if element_id % 2 == 0:
+            classes.setdefault(uf.uf_find(components, edge[0]), []).append(element_id // 2)
+    return Certificate([], list(classes.values()))
+
+
+def improve(graph: base_graph.BaseGraph, certificate: Certificate, adjacent: set[tuple[int, int]]) -> Certificate:
+    """
+    Lowers the bound of the certificate by local steps until none applies: releasing a contracted pair of vertices,
+    or merging two classes holding adjacent pairs, given as pairs of pair ids.
+
+    The union-find of Z and the rank of each class are kept: a release only contracts again the component of Z
+    it belongs to and ranks again the classes touching that component, a merge only ranks the merged class.
+    """
+    edges = graph.elements
+    vertices, _ = contract(graph, certificate.contracted)
+    # Contracted pairs of vertices of each component of Z, by root
+    components: dict[int, list[tuple[int, int]]] = {}
+    for pair in certificate.contracted:
+        components.setdefault(uf.uf_find(vertices, pair[0]), []).append(pair)
+    classes = dict(enumerate(list(pair_ids) for pair_ids in certificate.classes))
+    ranks = {k: class_rank(graph, vertices, class_elements(pair_ids)) for k, pair_ids in classes.items()}
+    owner = {pair_id: k for k, pair_ids in classes.items() for pair_id in pair_ids}
+    # Number of merges of each class, so that a pair of classes is only tried again once one of them grew
+    merges = dict.fromkeys(classes, 0)
+
+    def roots(k: int) -> set[int]:
+        return {uf.uf_find(vertices, edges[element_id][i]) for element_id in class_elements(classes[k]) for i in (0, 1)}
+
+    # Classes with an element touching each component of Z, by root
+    touching: dict[int, set[int]] = {}
+    for k in classes:
+        for root in roots(k) & components.keys():
+            touching.setdefault(root, set()).add(k)
+
+    def recontract(component: set[int], pairs: list[tuple[int, int]]) -> int:
+        """
+        Contracts the pairs again over the vertices of a component of Z, returning their rank.
+        """
+        for w in component:
+            vertices[w] = w
+        rank = 0
+        for u, v in pairs:
+            u, v = uf.uf_find(vertices, u), uf.uf_find(vertices, v)
+            if u != v:
+                vertices[u] = v
+                rank += 1
+        return rank
+
+    improved = True
+    while improved:
+        improved = False
+        for root in list(components):
+            pairs = components.pop(root)
+            affected = touching.pop(root, set())
+            component = {w for pair in pairs for w in pair}
+            rank = len(component) - 1
+            i = 0
+            while i < len(pairs):
+                without = pairs[:i] + pairs[i+1:]
+                lowered = recontract(component, without)
+                lowered_ranks = {k: class_rank(graph, vertices, class_elements(classes[k])) for k in affected}
+                if lowered - rank + sum(lowered_ranks[k] // 2 - ranks[k] // 2 for k in affected) < 0:
+                    pairs, rank, improved = without, lowered, True
+                    ranks.update(lowered_ranks)
+                else:
+                    i += 1
+            recontract(component, pairs)
+            for pair in pairs:
+                components.setdefault(uf.uf_find(vertices, pair[0]), []).append(pair)
+            for k in affected:
+                for new_root in roots(k) & component:
+                    if new_root in components:
+                        touching.setdefault(new_root, set()).add(k)
+
+        tried: set[tuple[int, int, int, int]] = set()
+        for p, q in sorted(adjacent):
+            k1, k2 = sorted((owner[p], owner[q]))
+            if k1 == k2 or (k1, merges[k1], k2, merges[k2]) in tried:
+                continue
+            tried.add((k1, merges[k1], k2, merges[k2]))
+            merged = class_rank(graph, vertices, class_elements(classes[k1] + classes[k2]))
+            if merged // 2 < ranks[k1] // 2 + ranks[k2] // 2:
+                for root in roots(k2) & touching.keys():
+                    touching[root].discard(k2)
+                    touching[root].add(k1)
+                for pair_id in classes[k2]:
+                    owner[pair_id] = k1
+                classes[k1] += classes.pop(k2)
+                ranks[k1] = merged
+                del ranks[k2], merges[k2]
+                merges[k1] += 1
+                improved = True
+    return Certificate([pair for pairs in components.values() for pair in pairs], list(classes.values()))
+
+
+def write_certificate(path: str, graph: base_graph.BaseGraph, matching: list[int], certificate: Certificate):
+    """
+    Writes the matching and its certificate as JSON, with the checksum of the instance.
+    """
+    with open(path, 'w') as file:
+        json.dump({
+            'checksum': binary_format.instance_checksum(graph),
+            'matching': sorted(matching),
+            'contracted': sorted(certificate.contracted),
+            'classes': [sorted(pair_ids) for pair_ids in certificate.classes],
+        }, file)
+
+
+def read_certificate(path: str, graph: base_graph.BaseGraph) -> tuple[list[int], Certificate]:
+    """
+    Reads a matching and its certificate, checking that they were written for this instance.
+    """
+    try:
+        with open(path) as file:
+            data = json.load(file)
+        checksum, matching, classes = data['checksum'], data['matching'], data['classes']
+        contracted = [tuple(vertices) for vertices in data['contracted']]
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        raise CertificateError(f'{path}: not a certificate ({error})')
+    if checksum != binary_format.instance_checksum(graph):
+        raise CertificateError(f'{path}: certificate of another instance')
+    return matching, Certificate(contracted, classes)
@@ -0,0 +1,94 @@
+"""
+Decomposition of an instance into independent sub-problems.
+
+The graphic matroid is the direct sum of the graphic matroids of the connected components,
+so a pair only interacts with the components containing its two edges. Grouping the components
+linked by a pair gives blocks which can be solved independently, the maximum matching being
+the union of the maximum matchings of the blocks.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import base_graph
+import union_find as uf
+import solver
+
+class Block:
+    """
+    A sub-problem: its edges, with vertices renumbered from 0, and the original id of each of its edges.
+    Edge 2k and 2k+1 of a block still form a pair.
+    """
+    def __init__(self):
+        self.tails = array('q')
+        self.heads = array('q')
+        self.element_ids: list[int] = []
+        self.matching: list[int] = []
+
+    def to_graph(self) -> base_graph.BaseGraph:
+        graph = base_graph.BaseGraph()
+        graph.add_edges(self.tails, self.heads)
+        return graph
+
+
+def decompose(graph: base_graph.BaseGraph, matching: list[int] = None) -> list[Block]:
+    """
+    Splits the graph into blocks of components linked by pairs, restricting the initial matching to each block.
+    """
+    if not matching:
+        matching = []
+    tails, heads, element_ids = graph.tails, graph.heads, graph.element_ids
+
+    # Connected components of the graph
+    components = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    for u, v in zip(tails, heads):
+        uf.uf_union(components, u, v, rank)
+
+    # Components linked by a pair, the edges of a pair being consecutive by id
+    slot_of = {element_id: slot for slot, element_id in enumerate(element_ids)}
+    blocks_set = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    for slot, element_id in enumerate(element_ids):
+        if element_id % 2 == 0:
+            other = slot_of[element_id + 1]
+            uf.uf_union(blocks_set, uf.uf_find(components, tails[slot]), uf.uf_find(components, tails[other]), rank)
+
+    blocks: dict[int, Block] = {}
+    local_vertices: dict[int, dict[int, int]] = {}
+    local_ids: dict[int, tuple[Block, int]] = {}
+    for element_id in sorted(element_ids):
+        slot = slot_of[element_id]
+        root = uf.uf_find(blocks_set, uf.uf_find(components, tails[slot]))
+        if root not in blocks:
+            blocks[root] = Block()
+            local_vertices[root] = {}
+        block, vertices = blocks[root], local_vertices[root]
+        block.tails.append(vertices.setdefault(tails[slot], len(vertices)))
+        block.heads.append(vertices.setdefault(heads[slot], len(vertices)))
+        local_ids[element_id] = (block, len(block.element_ids))
+        block.element_ids.append(element_id)
+
+    for element_id in sorted(matching):
+        block, local_id = local_ids[element_id]
+        block.matching.append(local_id)
+    return list(blocks.values())
+
+
+def _solve_block_(block: Block, options: dict) -> list[int]:
+    return solver.solve(block.to_graph(), block.matching, **options)
+
+
+def solve_decomposed(graph: base_graph.BaseGraph, matching: list[int] = None, workers: int = 1, **options) -> list[int]:
+    """
+    Computes a maximum matching by solving the blocks of the graph independently,
+    in `workers` processes if more than one. The other options are passed to `solver.solve`.
+    """
+    blocks = decompose(graph, matching)
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            matchings = list(executor.map(_solve_block_, blocks, [options] * len(blocks), chunksize=max(1, len(blocks) // (4*workers))))
+    else:
+        matchings = [_solve_block_(block, options) for block in blocks]
+    
+    return sorted(block.element_ids[local_id] for block, block_matching in zip(blocks, matchings) for local_id in block_matching)
@@ -1,7 +1,15 @@
+import itertools
 import sys
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import base_graph
+import union_find as uf
 
 class Element:
+    __slots__ = ('adjacency', 'edge', 'element_id', 'pair_id', 'pair', 'is_in_basis', 'is_meta', 'is_transform')
+
     def __init__(self, edge: base_graph.BaseEdge):
         self.adjacency: list[Element] = []
         self.edge = edge
@@ -13,6 +21,7 @@ class Element:
         
         self.is_in_basis = False
         self.is_meta = False
+        self.is_transform = False
 
     def __str__(self) -> str:
         return f'e{self.element_id},p{self.pair_id}-({self.edge[0] if self.edge is not None else "x"}, {self.edge[1] if self.edge is not None else "x"})' + ('s' if self.is_meta else '')
@@ -29,6 +38,96 @@ class Element:
     def is_element_parallel(self, other) -> bool:
         return (self.edge[0] == other.edge[0] and self.edge[1] == other.edge[1]) or (self.edge[0] == other.edge[1] and self.edge[1] == other.edge[0])
 
+    def add_adjacent(self, other):
+        self.adjacency.append(other)
+
+
+class ImplicitElement(Element):
+    """
+    Element of an implicit dependency graph: its adjacency is answered on demand from the rooted spanning forest.
+    Only the adjacencies added explicitly (with transforms) are stored in the element.
+    """
+    __slots__ = ('dep_graph', 'added_adjacency')
+
+    def __init__(self, edge: base_graph.BaseEdge, dep_graph):
+        self.dep_graph: DependencyGraph = dep_graph
+        super().__init__(edge)
+
+    @property
+    def adjacency(self) -> list[Element]:
+        return self.dep_graph.implicit_adjacency(self)
+
+    @adjacency.setter
+    def adjacency(self, value: list[Element]):
+        self.added_adjacency = value
+
+    def add_adjacent(self, other):
+        self.added_adjacency.append(other)
+        cached = self.dep_graph.adjacency_cache.get(self)
+        if cached is not None:
+            cached.append(other)
+
+class Bitmap(bytearray):
+    """
+    Set of element ids stored as one byte per id, smaller than a hash set for dense adjacencies.
+    """
+    def __init__(self, element_ids: list[int], size: int):
+        super().__init__(size)
+        for element_id in element_ids:
+            self.add(element_id)
+
+    def __contains__(self, element_id: int) -> bool:
+        return element_id < len(self) and self[element_id] != 0
+
+    def add(self, element_id: int):
+        if element_id >= len(self):
+            self.extend(bytes(element_id + 1 - len(self)))
+        self[element_id] = 1
+
+
+# Average degree, relative to the amount of elements, above which adjacency members are kept in bitmaps
+BITMAP_DENSITY = 1/32
+
+# Amount of non-basis elements below which the dependency graph is built in a single process
+PARALLEL_MIN_ELEMENTS = 4096
+
+def _cycles_chunk_(forest_name: str, vertex_count: int, tails: array, heads: array) -> array:
+    """
+    Computes the fundamental cycles of a chunk of non-basis edges, given by their endpoints, as `_fundamental_cycle_` does.
+    The rooted forest is read from the shared memory block: the parents, edge ids (-1 for roots) and depths of the vertices.
+    Returns the cycles as element ids, each one preceded by its length.
+    """
+    block = shared_memory.SharedMemory(name=forest_name)
+    forest = block.buf.cast('q')
+    parent, edge_id, depth = forest[:vertex_count], forest[vertex_count:2*vertex_count], forest[2*vertex_count:]
+    cycles = array('q')
+    try:
+        for u, v in zip(tails, heads):
+            backtrack_first: list[int] = []
+            backtrack_second: list[int] = []
+            while depth[u] > depth[v]:
+                backtrack_first.append(edge_id[u])
+                u = parent[u]
+            while depth[v] > depth[u]:
+                backtrack_second.append(edge_id[v])
+                v = parent[v]
+            while u != v:
+                if edge_id[u] < 0:
+                    raise RuntimeError('no common ancestor at backtracking CCA')
+                backtrack_first.append(edge_id[u])
+                u = parent[u]
+                backtrack_second.append(edge_id[v])
+                v = parent[v]
+            cycles.append(len(backtrack_first) + len(backtrack_second))
+            cycles.extend(backtrack_second)
+            cycles.extend(reversed(backtrack_first))
+    finally:
+        del parent, edge_id, depth
+        forest.release()
+        block.close()
+    return cycles
+
+
 def edge_to_element_id(edge: base_graph.BaseEdge):
     return edge[2][base_graph.ELEMENT_ID_KEY]
 
@@ -37,17 +136,37 @@ def edge_to_pair_id(edge: base_graph.BaseEdge):
 
 
 class DependencyGraph:
-    def __init__(self, graph: base_graph.BaseGraph, matching: list[int] = None):
+    """
+    The dependency graph of the elements with respect to a basis.
+
+    With `implicit`, adjacencies are not materialized: they are computed from the rooted spanning forest
+    when requested, and the last `cache_size` of them are kept in a LRU cache.
+    Otherwise, the fundamental cycles are computed in `workers` processes if more than one.
+    """
+    def __init__(self, graph: base_graph.BaseGraph, matching: list[int] = None, implicit: bool = False, cache_size: int = 0, workers: int = 1):
         if not matching:
             matching = []
+        self.workers = workers
+
+        self.implicit = implicit
+        self.cache_size = cache_size
+        self.adjacency_cache: OrderedDict[Element, list[Element]] = OrderedDict()
+        self.graph = graph
+        # Element ids of the adjacency of the elements, for constant time membership tests
+        self.members: dict[int, set[int] | Bitmap] = {}
+        self.use_bitmaps = False
+        # Elements whose adjacency was changed by the last `rebase`, None if unknown
+        self.changed_elements: set[Element] = None
 
         self.basis: list[Element] = []
+        self.left_basis: set[Element] = set()
+        self.entered_basis: set[Element] = set()
         
         self.elements: dict[int, Element] = {}
         self.singletons = []
         self.pairs: list[list[Element]] = [[None, None] for i in range(len(graph.edges())//2)]
         for edge in graph.edges():
-            e = Element(edge)
+            e = self._new_element_(edge)
             self.add_element(edge_to_element_id(edge), e)
             self.pairs[edge_to_pair_id(edge)][edge[2][base_graph.ELEMENT_ID_KEY] % 2] = e
         
@@ -57,10 +176,171 @@ class DependencyGraph:
         
         self._compute_adj_(graph, matching)
         
+    def _new_element_(self, edge: base_graph.BaseEdge) -> Element:
+        return ImplicitElement(edge, self) if self.implicit else Element(edge)
+
     def make_adjacent(self, elem1: Element, elem2: Element):
-        elem1.adjacency.append(elem2)
-        elem2.adjacency.append(elem1)
+        elem1.add_adjacent(elem2)
+        elem2.add_adjacent(elem1)
+        if self.members:
+            for elem, other in ((elem1, elem2), (elem2, elem1)):
+                members = self.members.get(elem.element_id)
+                if members is not None:
+                    members.add(other.element_id)
+
+    def _update_density_(self):
+        """
+        Chooses the representation of the adjacency members from the average degree, and clears them.
+        Implicit dependency graphs always use hash sets, built on demand.
+        """
+        self.members.clear()
+        self.id_bound = max(self.elements, default=-1) + 1
+        degrees = sum(len(e.adjacency) for e in self.elements.values())
+        self.use_bitmaps = degrees > BITMAP_DENSITY * len(self.elements) ** 2
+
+    def adjacency_members(self, elem: Element, adjacency: list[Element] = None) -> set[int] | Bitmap:
+        """
+        The ids of the adjacency of the element, as a hash set or, for dense dependency graphs, a bitmap.
+        They are kept until the next `rebase`, except for implicit dependency graphs: the adjacency already
+        computed by the caller can then be given, so that it is not computed again.
+        """
+        members = self.members.get(elem.element_id)
+        if members is None:
+            element_ids = [a.element_id for a in (elem.adjacency if adjacency is None else adjacency)]
+            members = Bitmap(element_ids, self.id_bound) if self.use_bitmaps else set(element_ids)
+            if not self.implicit:
+                self.members[elem.element_id] = members
+        return members
+
+    def is_adjacent(self, elem1: Element, elem2: Element) -> bool:
+        return elem2.element_id in self.adjacency_members(elem1)
+
+    def symmetric_difference(self, elem1: Element, elem2: Element) -> list[Element]:
+        """
+        The elements adjacent to exactly one of the two elements, those of elem1 first, in adjacency order.
+        """
+        adjacency1, adjacency2 = elem1.adjacency, elem2.adjacency
+        members1 = self.adjacency_members(elem1, adjacency1)
+        members2 = self.adjacency_members(elem2, adjacency2)
+        return [a for a in adjacency1 if a.element_id not in members2] + [a for a in adjacency2 if a.element_id not in members1]
     
+    def exchange(self, ebunch: list[Element]):
+        """
+        Exchanges the given elements with respect to the basis (symmetric difference).
+        The exchanged elements are recorded so that `rebase` can update the adjacencies in place.
+        """
+        for e in ebunch:
+            if e.is_in_basis:
+                e.is_in_basis = False
+                self.basis.remove(e)
+                if e in self.entered_basis:
+                    self.entered_basis.remove(e)
+                else:
+                    self.left_basis.add(e)
+            else:
+                e.is_in_basis = True
+                self.basis.append(e)
+                if e in self.left_basis:
+                    self.left_basis.remove(e)
+                else:
+                    self.entered_basis.add(e)
+
+    def discard_transforms(self) -> set[Element]:
+        """
+        Removes the transforms added by a search from the elements and from the adjacencies they were added to.
+        Returns the elements whose adjacency changed.
+        """
+        # Transforms are added after the other elements
+        transforms = list(itertools.takewhile(lambda e: e.is_transform, reversed(self.elements.values())))
+        touched: set[Element] = set()
+        for x in transforms:
+            del self.elements[x.element_id]
+            touched.update(a for a in x.adjacency if not a.is_transform)
+        for e in touched:
+            if self.implicit:
+                e.added_adjacency = [a for a in e.added_adjacency if not a.is_transform]
+            else:
+                e.adjacency = [a for a in e.adjacency if not a.is_transform]
+        if transforms:
+            self.adjacency_cache.clear()
+            self.members.clear()
+        return touched
+
+    def update_pairs(self, graph: base_graph.BaseGraph, added: list[int], removed: list[int]):
+        """
+        Updates the dependency graph in place after pairs, given by their pair ids, were added to the graph
+        and removed from it (see `BaseGraph.remove_edges`), after `rebase` or a search finding no augmenting path,
+        whose transforms are discarded first.
+
+        A removed element of the basis is replaced by a singleton on the same edge, which keeps the basis forest
+        and the fundamental cycles: the singleton may leave the basis through a later augmentation, and the maximum
+        matching is the same, as it only holds pairs of the graph. An added element joining two trees of the basis
+        adds a singleton on its edge to the basis, then the fundamental cycles of the added elements are computed.
+        Singletons get ids above those of the graph and of the elements. `changed_elements` is unknown afterwards.
+        """
+        self.discard_transforms()
+        next_id = max(graph.max_element_id, max(self.elements, default=-1)) + 1
+
+        def singleton(u: int, v: int) -> Element:
+            nonlocal next_id
+            s = self._new_element_((u, v, {base_graph.ELEMENT_ID_KEY: next_id, base_graph.PAIR_ID_KEY: None}))
+            next_id += 1
+            s.is_meta = True
+            s.is_in_basis = True
+            self.add_element(s.element_id, s)
+            self.singletons.append(s.element_id)
+            return s
+
+        # Singleton replacing each removed element of the basis, and element ids removed from each basis side
+        replaced: dict[Element, Element] = {}
+        removed_ids: dict[Element, set[int]] = {}
+        for pair_id in removed:
+            for element_id in (2*pair_id, 2*pair_id+1):
+                e = self.elements.pop(element_id)
+                if e.is_in_basis:
+                    s = replaced[e] = singleton(e.edge[0], e.edge[1])
+                    if not self.implicit:
+                        s.adjacency = e.adjacency
+                elif not self.implicit:
+                    for a in e.adjacency:
+                        removed_ids.setdefault(a, set()).add(element_id)
+        if replaced:
+            self.basis = [replaced.get(e, e) for e in self.basis]
+            if not self.implicit:
+                for a in {a for s in replaced.values() for a in s.adjacency}:
+                    a.adjacency = [replaced.get(b, b) for b in a.adjacency]
+        for a, element_ids in removed_ids.items():
+            a = replaced.get(a, a)
+            a.adjacency = [e for e in a.adjacency if e.element_id not in element_ids]
+
+        added_elements: list[Element] = []
+        for pair_id in added:
+            e1, e2 = (self._new_element_(graph.elements[2*pair_id+i]) for i in (0, 1))
+            e1.pair, e2.pair = e2, e1
+            for e in (e1, e2):
+                self.add_element(e.element_id, e)
+                added_elements.append(e)
+        components = list(range(graph.vertex_count))
+        rank = [0] * graph.vertex_count
+        for e in self.basis:
+            uf.uf_union(components, uf.uf_find(components, e.edge[0]), uf.uf_find(components, e.edge[1]), rank)
+        for e in added_elements:
+            u, v = uf.uf_find(components, e.edge[0]), uf.uf_find(components, e.edge[1])
+            if u != v:
+                uf.uf_union(components, u, v, rank)
+                self.basis.append(singleton(e.edge[0], e.edge[1]))
+
+        parent_forest = graph.get_rooted_forest([e.edge for e in self.basis])
+        if self.implicit:
+            self._index_forest_(parent_forest)
+        else:
+            for e in added_elements:
+                e.adjacency = self._fundamental_cycle_(e, parent_forest)
+                for a in e.adjacency:
+                    a.adjacency.append(e)
+        self._update_density_()
+        self.changed_elements = None
+
     def add_element(self, key: int, elem: Element):
         if key in self.elements.keys():
             raise RuntimeError('trying to add an element with an already existing id')
@@ -93,45 +373,212 @@ class DependencyGraph:
         for e in basis_edges:
             eid = edge_to_element_id(e)
             if not eid in self.elements.keys():
-                self.elements[eid] = Element(e)
+                self.elements[eid] = self._new_element_(e)
                 self.singletons.append(eid)
                 self.elements[eid].is_meta = True
             self.elements[eid].is_in_basis = True
             self.basis.append(self.elements[eid])
 
+        if self.implicit:
+            self._index_forest_(parent_forest)
+            return
+
+        if self.workers > 1 and len(non_basis) >= PARALLEL_MIN_ELEMENTS:
+            elements = self.elements
+            for e, cycle in zip(non_basis, self._compute_cycles_parallel_(non_basis, parent_forest)):
+                e.adjacency = [elements[eid] for eid in cycle]
+        else:
+            for e in non_basis:
+                e.adjacency = self._fundamental_cycle_(e, parent_forest)
+        # The basis side of the adjacencies is built from the non-basis side in one pass, as in `rebase`
         for e in non_basis:
-            # Backtracking to find the cycle with e = (u,v)
-            current = e.edge[0]
-
-            # We build the path from u to r (root of current tree)
-            backtrack_first: list[Element | int] = [current]
-            while parent_forest[current][0] != current:
-                backtrack_first += [parent_forest[current][1], parent_forest[current][0]]
-                current = parent_forest[current][0]
-            
-            # We then 
-            backtrack_second: list[Element] = []
-            current = e.edge[1]
-            while True:
-                for i, v in enumerate(backtrack_first):
-                    if i % 2 != 0:
-                        continue
-                    if v != current:
-                        continue
-                    # backtracking
-                    for elem2_id in backtrack_second:
-                        self.make_adjacent(e, self.elements[elem2_id])
-                    for j in range(i-1, -1, -2):
-                        self.make_adjacent(e, self.elements[backtrack_first[j]])
-                    break # Quit both loops
-                else:
-                    if parent_forest[current][1] is None:
-                        raise RuntimeError('infinite loop at backtracking CCA')
-                    backtrack_second.append(parent_forest[current][1])
-                    current = parent_forest[current][0]
+            for a in e.adjacency:
+                a.adjacency.append(e)
+        self._update_density_()
+
+    def _compute_cycles_parallel_(self, non_basis: list[Element], parent_forest: dict[int, tuple[int, int, int]]) -> list[array]:
+        """
+        Computes the fundamental cycles of the non-basis elements, as element ids, in chunks over a process pool.
+        The rooted forest is shared with the workers through a shared memory block instead of being sent to each of them.
+        """
+        vertex_count = self.graph.vertex_count
+        block = shared_memory.SharedMemory(create=True, size=8 * max(1, 3 * vertex_count))
+        try:
+            forest = block.buf.cast('q')
+            for v in range(vertex_count):
+                p, eid, depth = parent_forest.get(v, (v, None, 0))
+                forest[v] = p
+                forest[vertex_count + v] = -1 if eid is None else eid
+                forest[2*vertex_count + v] = depth
+            forest.release()
+
+            chunk_size = -(-len(non_basis) // (4 * self.workers))
+            chunks = [non_basis[i:i+chunk_size] for i in range(0, len(non_basis), chunk_size)]
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = executor.map(_cycles_chunk_, [block.name] * len(chunks), [vertex_count] * len(chunks),
+                    [array('q', (e.edge[0] for e in chunk)) for chunk in chunks], [array('q', (e.edge[1] for e in chunk)) for chunk in chunks])
+                cycles: list[array] = []
+                for result in results:
+                    i = 0
+                    while i < len(result):
+                        cycles.append(result[i+1:i+1+result[i]])
+                        i += 1 + result[i]
+        finally:
+            block.close()
+            block.unlink()
+        return cycles
+
+    def _fundamental_cycle_(self, e: Element, parent_forest: dict[int, tuple[int, int, int]]) -> list[Element]:
+        """
+        Computes the basis elements of the elementary cycle created when adding the non-basis element e to the forest.
+
+        Both endpoints of e = (u,v) climb towards their lowest common ancestor using the depths of the rooted forest,
+        so this runs in time proportional to the length of the cycle.
+        """
+        u = e.edge[0]
+        v = e.edge[1]
+        backtrack_first: list[int] = []
+        backtrack_second: list[int] = []
+
+        while parent_forest[u][2] > parent_forest[v][2]:
+            backtrack_first.append(parent_forest[u][1])
+            u = parent_forest[u][0]
+        while parent_forest[v][2] > parent_forest[u][2]:
+            backtrack_second.append(parent_forest[v][1])
+            v = parent_forest[v][0]
+        while u != v:
+            if parent_forest[u][1] is None:
+                raise RuntimeError('no common ancestor at backtracking CCA')
+            backtrack_first.append(parent_forest[u][1])
+            u = parent_forest[u][0]
+            backtrack_second.append(parent_forest[v][1])
+            v = parent_forest[v][0]
+        
+        return [self.elements[eid] for eid in backtrack_second] + [self.elements[eid] for eid in reversed(backtrack_first)]
+
+    def _index_forest_(self, parent_forest: dict[int, tuple[int, int, int]]):
+        """
+        Preprocesses the rooted forest for the implicit adjacencies: a preorder of the vertices
+        (the subtree of a vertex is contiguous in it), the subtree sizes, and the vertex below each basis element.
+        """
+        self.parent_forest = parent_forest
+        self.adjacency_cache.clear()
+
+        children: dict[int, list[int]] = {v: [] for v in parent_forest}
+        roots: list[int] = []
+        self.forest_child: dict[int, int] = {}
+        for v, (p, eid, _) in parent_forest.items():
+            if eid is None:
+                roots.append(v)
+            else:
+                children[p].append(v)
+                self.forest_child[eid] = v
+        
+        self.preorder: list[int] = []
+        for root in roots:
+            stack = [root]
+            while len(stack) > 0:
+                current = stack.pop()
+                self.preorder.append(current)
+                stack.extend(children[current])
+        self.preorder_index: dict[int, int] = {v: i for i, v in enumerate(self.preorder)}
+        self.subtree_size: dict[int, int] = {v: 1 for v in self.preorder}
+        for v in reversed(self.preorder):
+            p = parent_forest[v][0]
+            if p != v:
+                self.subtree_size[p] += self.subtree_size[v]
+
+    def _compute_implicit_adjacency_(self, elem: Element) -> list[Element]:
+        if not elem.is_in_basis:
+            return self._fundamental_cycle_(elem, self.parent_forest)
+        
+        # The non-basis elements whose cycle goes through a basis element are those leaving the subtree below it
+        result: list[Element] = []
+        child = self.forest_child.get(elem.element_id)
+        if child is None:
+            # A singleton left on the edge of a removed pair, in a tree without any edge of the graph (see `update_pairs`)
+            return result
+        start = self.preorder_index[child]
+        end = start + self.subtree_size[child]
+        for v in self.preorder[start:end]:
+            for edge in self.graph.incident_edges(v):
+                other = edge[1] if edge[0] == v else edge[0]
+                if start <= self.preorder_index[other] < end:
                     continue
-                break
-    
+                e = self.elements[edge_to_element_id(edge)]
+                if not e.is_in_basis:
+                    result.append(e)
+        return result
+
+    def implicit_adjacency(self, elem: Element) -> list[Element]:
+        """
+        The adjacency of an element of an implicit dependency graph, including the adjacencies added explicitly.
+        """
+        cached = self.adjacency_cache.get(elem)
+        if cached is not None:
+            self.adjacency_cache.move_to_end(elem)
+            return cached
+        adjacency = self._compute_implicit_adjacency_(elem) + elem.added_adjacency
+        if self.cache_size > 0:
+            self.adjacency_cache[elem] = adjacency
+            if len(self.adjacency_cache) > self.cache_size:
+                self.adjacency_cache.popitem(last=False)
+        return adjacency
+
+    def rebase(self, graph: base_graph.BaseGraph):
+        """
+        Updates the dependency graph in place after the basis was changed through `exchange`.
+
+        Transforms are discarded, singletons that left the basis are removed, and only the fundamental cycles
+        going through an element that left the basis are recomputed:
+        any other cycle is still contained in the new basis, thus is still the fundamental cycle.
+        Those elements are found on the basis side of the adjacencies of the elements that left the basis,
+        and only the basis side lists of their old and new cycles, and of the elements that entered the basis, are updated.
+        The exchanged elements and those whose adjacency changed are recorded in `changed_elements`.
+        """
+        left, entered = self.left_basis, self.entered_basis
+        changed = left | entered
+        changed.update(self.discard_transforms())
+        for e in left:
+            if e.is_meta:
+                del self.elements[e.element_id]
+        self.singletons = [eid for eid in self.singletons if eid in self.elements]
+        self.left_basis = set()
+        self.entered_basis = set()
+
+        parent_forest = graph.get_rooted_forest([e.edge for e in self.basis])
+
+        if self.implicit:
+            self._index_forest_(parent_forest)
+            self.changed_elements = None
+            return
+
+        recomputed = {e for e in left if not e.is_meta}
+        recomputed.update(a for e in left for a in e.adjacency if not a.is_in_basis)
+        # The old cycles are removed from the basis side, except for the elements that left the basis,
+        # whose adjacency was on the basis side
+        removed: dict[Element, set[int]] = {}
+        for e in itertools.chain(entered, recomputed):
+            if e in left:
+                continue
+            for a in e.adjacency:
+                if a.is_in_basis:
+                    removed.setdefault(a, set()).add(e.element_id)
+        for a, element_ids in removed.items():
+            a.adjacency = [e for e in a.adjacency if e.element_id not in element_ids]
+            changed.add(a)
+        for e in entered:
+            e.adjacency = []
+        for e in recomputed:
+            changed.add(e)
+            e.adjacency = self._fundamental_cycle_(e, parent_forest)
+            changed.update(e.adjacency)
+            for a in e.adjacency:
+                a.adjacency.append(e)
+        self._update_density_()
+
+        self.changed_elements = changed
+
     def __str__(self) -> str:
         lines = []
         for e in self.elements.values():
@@ -0,0 +1,175 @@
+"""
+Dynamic instances: pairs are added and removed between solves, and each solve starts from the previous maximum matching.
+
+Adding a pair or removing a pair of the matching changes the maximum matching size by at most one pair,
+and the previous matching minus the removed pairs is still valid, so a solve after a few edits only needs
+as many augmentations as there were edits.
+
+The graph and its dependency graph are kept across solves: the edits are applied to them in place
+(see `DependencyGraph.update_pairs`), in time proportional to the vertices and to the fundamental cycles
+of the added pairs, instead of building them again in O(n*m).
+"""
+
+from array import array
+
+import base_graph
+import dependency_graph as dg
+import heuristics
+import solver
+
+Edge = tuple[int, int]
+
+# Ratio of the largest element id to the amount of elements above which the graph and its dependency graph are built
+# again, with consecutive ids: ids of removed pairs are not reused, and singletons are added with new ids
+SPARSE_IDS = 4
+
+
+class DynamicSolver:
+    """
+    Holds the pairs of an instance and its current maximum matching, given as pair ids.
+    Pair ids are stable: they are the pair ids of the initial graph, then the ids returned by `add_pair`.
+    The options are passed to `solver.solve` (`on_augment` then receives the intermediary matchings
+    as sorted pair ids), except `implicit`, `cache_size` and `workers`, passed to the dependency graph,
+    and `warm_start`, only applied when the dependency graph is built.
+
+    The graph and the dependency graph of the last solve hold the pairs under internal pair ids. They are kept
+    and updated in place with the edits done since, unless `incremental` is False, the dependency graph then being
+    built again at each solve.
+    """
+    def __init__(self, graph: base_graph.BaseGraph = None, matching: list[int] = None, **options):
+        self.pairs: dict[int, tuple[Edge, Edge]] = {}
+        self.matching: set[int] = set()
+        self.options = options
+        self.next_pair_id = 0
+        # Whether the matching may not be maximum anymore
+        self.is_dirty = True
+        # Augmentations done by the last solve
+        self.augmentations = 0
+
+        # Graph and dependency graph of the last solve, the internal pair id of each of their pairs and back,
+        # and the pairs added (by pair id) and removed (by internal pair id) since
+        self.graph: base_graph.BaseGraph = None
+        self.dep_graph: dg.DependencyGraph = None
+        self.internal: dict[int, int] = {}
+        self.external: dict[int, int] = {}
+        self.added: list[int] = []
+        self.removed: list[int] = []
+
+        if graph is not None:
+            edges = graph.elements
+            for pair_id in range(len(edges) // 2):
+                e1, e2 = edges[2*pair_id], edges[2*pair_id+1]
+                self.pairs[pair_id] = ((e1[0], e1[1]), (e2[0], e2[1]))
+            self.next_pair_id = len(edges) // 2
+            if matching:
+                self.matching = {element_id // 2 for element_id in matching}
+
+    def add_pair(self, edge1: Edge, edge2: Edge) -> int:
+        """
+        Adds a pair of edges, given by their endpoints, and returns its id.
+        """
+        pair_id = self.next_pair_id
+        self.next_pair_id += 1
+        self.pairs[pair_id] = (edge1, edge2)
+        self.added.append(pair_id)
+        self.is_dirty = True
+        return pair_id
+
+    def remove_pair(self, pair_id: int):
+        """
+        Removes a pair, and from the matching if it is in it: the remaining pairs still form a forest.
+        """
+        if pair_id not in self.pairs:
+            raise KeyError(f'no pair with id {pair_id}')
+        del self.pairs[pair_id]
+        if pair_id in self.internal:
+            internal = self.internal.pop(pair_id)
+            del self.external[internal]
+            self.removed.append(internal)
+        elif pair_id in self.added:
+            self.added.remove(pair_id)
+        if pair_id in self.matching:
+            self.matching.remove(pair_id)
+            self.is_dirty = True
+
+    def to_graph(self) -> tuple[base_graph.BaseGraph, list[int]]:
+        """
+        Builds the current instance, its pair k being the k-th pair id of the returned list.
+        """
+        pair_ids = sorted(self.pairs)
+        tails = array('q')
+        heads = array('q')
+        for pair_id in pair_ids:
+            for u, v in self.pairs[pair_id]:
+                tails.append(u)
+                heads.append(v)
+        graph = base_graph.BaseGraph()
+        graph.add_edges(tails, heads)
+        return graph, pair_ids
+
+    def _build_(self):
+        """
+        Builds the graph and the dependency graph of the current instance, holding the current matching.
+        """
+        self.graph, pair_ids = self.to_graph()
+        self.internal = {pair_id: k for k, pair_id in enumerate(pair_ids)}
+        self.external = dict(enumerate(pair_ids))
+        self.added, self.removed = [], []
+        matching = [element_id for k, pair_id in enumerate(pair_ids) if pair_id in self.matching for element_id in (2*k, 2*k+1)]
+        if self.options.get('warm_start'):
+            matching = heuristics.greedy_matching(self.graph, matching)
+        self.dep_graph = dg.DependencyGraph(self.graph, matching, self.options.get('implicit', False), self.options.get('cache_size', 0), self.options.get('workers', 1))
+
+    def _update_(self):
+        """
+        Applies the edits done since the last solve to its graph and dependency graph.
+        """
+        if self.dep_graph.left_basis or self.dep_graph.entered_basis:
+            # The last solve stopped right after an augmentation (`stop_at_optimum`)
+            self.dep_graph.rebase(self.graph)
+        self.graph.remove_edges({element_id for internal in self.removed for element_id in (2*internal, 2*internal+1)})
+        # Internal pair ids of the added pairs follow every element id, singletons included
+        first = max(self.graph.max_element_id, max(self.dep_graph.elements, default=-1)) // 2 + 1
+        added = []
+        for internal, pair_id in enumerate(self.added, first):
+            self.internal[pair_id] = internal
+            self.external[internal] = pair_id
+            for i, (u, v) in enumerate(self.pairs[pair_id]):
+                self.graph.add_edge(u, v, 2*internal + i)
+            added.append(internal)
+        self.dep_graph.update_pairs(self.graph, added, self.removed)
+        self.added, self.removed = [], []
+
+    def solve(self) -> list[int]:
+        """
+        Re-optimizes the matching from the previous one, returns the sorted ids of the pairs of a maximum matching.
+        """
+        self.augmentations = 0
+        if not self.is_dirty:
+            return sorted(self.matching)
+
+        if not self.pairs:
+            self.graph, self.dep_graph = None, None
+            self.internal, self.external, self.added, self.removed = {}, {}, [], []
+            self.is_dirty = False
+            return []
+
+        if self.dep_graph is None or max(self.dep_graph.elements, default=-1) > SPARSE_IDS * len(self.dep_graph.elements):
+            self._build_()
+        else:
+            self._update_()
+
+        on_augment = self.options.get('on_augment')
+        def count_augmentation(intermediary: list[int]):
+            self.augmentations += 1
+            if on_augment is not None:
+                on_augment(sorted(self.external[element_id // 2] for element_id in intermediary if element_id % 2 == 0))
+
+        options = {name: value for name, value in self.options.items() if name not in ('implicit', 'cache_size', 'workers', 'warm_start')}
+        options['on_augment'] = count_augmentation
+        matching = solver.solve(self.graph, dep_graph=self.dep_graph, **options)
+        self.matching = {self.external[element_id // 2] for element_id in matching}
+        if not self.options.get('incremental', True):
+            self.dep_graph = None
+        self.is_dirty = False
+        return sorted(self.matching)
@@ -0,0 +1,89 @@
+"""
+Heuristics giving a large valid matching quickly, used as the initial matching of the exact solver.
+
+Each augmentation of the solver adds exactly one pair, so every pair added here saves one augmenting search.
+"""
+
+import random
+
+import base_graph
+import union_find as uf
+
+
+def _greedy_insert_(graph: base_graph.BaseGraph, matching: list[int], pair_order: list[int]) -> list[int]:
+    """
+    Extends the matching by inserting the pairs in the given order whenever the result stays a forest.
+    """
+    edges = graph.elements
+    uf_set = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    in_matching = set(matching)
+    for element_id in matching:
+        uf.uf_union(uf_set, edges[element_id][0], edges[element_id][1], rank)
+
+    result = list(matching)
+    for pair in pair_order:
+        if 2*pair in in_matching:
+            continue
+        e1, e2 = edges[2*pair], edges[2*pair+1]
+        a, b = uf.uf_find(uf_set, e1[0]), uf.uf_find(uf_set, e1[1])
+        c, d = uf.uf_find(uf_set, e2[0]), uf.uf_find(uf_set, e2[1])
+        # The second edge closes a cycle if it links the two components the first edge just linked
+        if a == b or c == d or (a == c and b == d) or (a == d and b == c):
+            continue
+        uf.uf_union(uf_set, a, b, rank)
+        uf.uf_union(uf_set, c, d, rank)
+        result += [2*pair, 2*pair+1]
+    return sorted(result)
+
+
+def _swap_pass_(graph: base_graph.BaseGraph, matching: list[int], pair_order: list[int]) -> list[int]:
+    """
+    Tries, for each pair of the matching, to remove it and greedily insert at least two other pairs.
+    """
+    in_matching = set(matching)
+    for pair in sorted({element_id // 2 for element_id in matching}):
+        if 2*pair not in in_matching:
+            continue
+        without = [element_id for element_id in matching if element_id // 2 != pair]
+        candidate = _greedy_insert_(graph, without, [p for p in pair_order if p != pair])
+        if len(candidate) > len(matching):
+            matching = candidate
+            in_matching = set(matching)
+    return matching
+
+
+def greedy_matching(graph: base_graph.BaseGraph, matching: list[int] = None, restarts: int = 0, swap_passes: int = 0, seed: int = None) -> list[int]:
+    """
+    Extends the matching greedily, in pair order and then with `restarts` random pair orders,
+    keeping the largest result, which is then improved by `swap_passes` passes of 1-for-2 pair swaps.
+    """
+    if not matching:
+        matching = []
+    pair_count = len(graph.elements) // 2
+    rng = random.Random(seed)
+
+    pair_order = list(range(pair_count))
+    best = _greedy_insert_(graph, matching, pair_order)
+    for _ in range(restarts):
+        rng.shuffle(pair_order)
+        candidate = _greedy_insert_(graph, matching, pair_order)
+        if len(candidate) > len(best):
+            best = candidate
+
+    for _ in range(swap_passes):
+        improved = _swap_pass_(graph, best, pair_order)
+        if len(improved) == len(best):
+            break
+        best = improved
+    return best
+
+
+def warm_start(graph: base_graph.BaseGraph, matching: list[int] = None, restarts: int = 0, swap_passes: int = 0, seed: int = None) -> tuple[list[int], int]:
+    """
+    Computes a warm start matching with `greedy_matching`.
+    Returns it as well as the amount of augmentations it saves to the solver.
+    """
+    initial_size = len(matching) if matching else 0
+    result = greedy_matching(graph, matching, restarts, swap_passes, seed)
+    return result, (len(result) - initial_size) // 2
@@ -1,7 +1,82 @@
-import base_graph
+import mmap
+import re
 import sys
+from array import array
 
-def read_base_graph_from_stsh_input() -> tuple[base_graph.BaseGraph, list[int]]:
+import base_graph
+import binary_format
+
+
+# Edge lines as written by `format_stsh`, which are tokenized in one pass
+CANONICAL_EDGES = re.compile(rb'(?:[0-9]+ [0-9]+\n)*')
+
+
+class InputError(ValueError):
+    """
+    Error in an stsh input, with the (1-based) line where it was detected.
+    """
+    def __init__(self, message: str, line: int):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+
+
+def _read_edges_(rows: list[list[bytes]]) -> tuple[array, array, int]:
+    """
+    Reads the edges line by line, returns their endpoints and the index of the '0 0' row.
+    """
+    tails = array('q')
+    heads = array('q')
+    for end, row in enumerate(rows):
+        try:
+            x, y = int(row[0]), int(row[1])
+        # Edge reading error handling
+        except (ValueError, IndexError):
+            raise InputError('Input is malformed: edge entry is not two vertices \'x y\'', end+2) from None
+        if x <= 0 or y <= 0:
+            break
+        tails.append(x-1)
+        heads.append(y-1)
+    else:
+        raise InputError('Input is incomplete: edges are not followed by \'0 0\'.', len(rows)+1)
+    if x != 0 or y != 0:
+        raise InputError('Input is malformed: edge separation is not \'0 0\'.', end+2)
+    if len(tails) % 2 != 0:
+        raise InputError('Input is incomplete: need an even amount of edges.', end+2)
+    return tails, heads, end
+
+
+def _read_matching_(rows: list[list[bytes]], first_line: int, edge_count: int) -> list[int]:
+    """
+    Reads the matching rows, until the '0' row, the first one being at the given (1-based) line.
+    """
+    matching = []
+    lines = []
+    for i, row in enumerate(rows):
+        try:
+            e = int(row[0])
+        except (ValueError, IndexError):
+            raise InputError('Input is malformed: matching edge given is not a number', first_line+i) from None
+        if e <= 0:
+            break
+        matching.append(e-1)
+        lines.append(first_line+i)
+
+    order = sorted(range(len(matching)), key=lambda i: matching[i])
+    matching = [matching[i] for i in order]
+    if len(matching) % 2 != 0:
+        raise InputError('Input is incomplete: matching needs an even amount of edges', lines[-1])
+    for i in range(0, len(matching), 2):
+        if matching[i] % 2 != 0 or matching[i]+1 != matching[i+1] or matching[i+1] >= edge_count:
+            raise InputError('Input is wrong: matching provided is invalid', lines[order[i]])
+    return matching
+
+
+def _rows_(data: bytes) -> list[list[bytes]]:
+    # Anything beyond the first two numbers of a line is ignored
+    return [line.split(None, 2)[:2] for line in data.rstrip().splitlines()]
+
+
+def parse_stsh(data: bytes) -> tuple[base_graph.BaseGraph, list[int]]:
     """
     Input format follows from Stallmann & Shapiro's (1986) implementation input:
 
@@ -16,55 +91,71 @@ def read_base_graph_from_stsh_input() -> tuple[base_graph.BaseGraph, list[int]]:
     ...
     [ek]
     0
+
+    The data can be any bytes-like object supporting `find` and regular expressions, such as a memory map.
+    When the edge lines are two numbers separated by a space, the edges are tokenized and converted in one pass
+    over their block, otherwise they are read line by line, which also reports the errors.
+    The edges are added to the graph in bulk. Raises an InputError if the input is malformed.
     """
+    # First line is dumped
+    start = data.find(b'\n') + 1
+    # Start of the '0 0' line ending the edges
+    end = data.find(b'\n0 0\n', start - 1) + 1 if start > 0 else 0
+    vertices = None
+    if end > 0 and CANONICAL_EDGES.fullmatch(data, start, end):
+        vertices = array('q', map(int, data[start:end].split()))
+        if len(vertices) % 4 != 0 or (len(vertices) > 0 and min(vertices) == 0):
+            vertices = None
+
+    if vertices is not None:
+        vertices = array('q', map((1).__rsub__, vertices))
+        tails = vertices[0::2]
+        heads = vertices[1::2]
+        # Each edge is on its own line, after the first line and followed by the '0 0' line
+        matching = _read_matching_(_rows_(data[end+4:]), len(tails)+3, len(tails))
+    else:
+        rows = _rows_(bytes(data))[1:]
+        tails, heads, end = _read_edges_(rows)
+        matching = _read_matching_(rows[end+1:], end+3, len(tails))
 
     result = base_graph.BaseGraph()
-    edges_to_add = []
-    edges_added = 0
-    matching = []
+    result.add_edges(tails, heads)
+    
+    return result, matching
 
-    input() # Dump first line
 
+def format_stsh(graph: base_graph.BaseGraph, matching: list[int] = None) -> bytes:
+    """
+    Writes the graph and the matching in the format read by `parse_stsh`.
+    """
+    lines = [str(graph.vertex_count)]
+    lines += [f'{u+1} {v+1}' for u, v in zip(graph.tails, graph.heads)]
+    lines.append('0 0')
+    lines += [str(e+1) for e in (matching or [])]
+    lines.append('0')
+    return ('\n'.join(lines) + '\n').encode()
 
-    # Read edges
-    try:
-        x, y = [int(e) for e in input().split()[:2]]
-        while x > 0 and y > 0:
-            edges_to_add.append((x-1, y-1, edges_added))
-            edges_added += 1
-            x, y = [int(e) for e in input().split()[:2]]
-    # Edge reading error handling
-    except ValueError:
-        print('Input is malformed: edge entry is not two vertices \'x y\'', file=sys.stderr)
-        return None
-    if x != 0 or y != 0:
-        print('Input is malformed: edge separation is not \'0 0\'.', file=sys.stderr)
-        return None
-    if edges_added % 2 != 0:
-        print('Input is incomplete: need an even amount of edges.', file=sys.stderr)
-        return None
-
-    # Read matching
-    try:
-        e = int(input().split()[0])
-        while e > 0:
-            matching.append(e-1)
-            e = int(input().split()[0])
-        matching.sort()
-    # Matching reading error handling
-    except ValueError:
-        print('Input is malformed: matching edge given is not a number')
-        return None
-    if len(matching) % 2 != 0:
-        print('Input is incomplete: matching needs an even amount of edges')
-        return None
-    for i in range(0, len(matching), 2):
-        if matching[i]+1 != matching[i+1] or matching[i] > edges_added or matching[i] < 0:
-            print('Input is wrong: matching provided is invalid')
-            return None
 
-    result.init_instance()
-    for edge in edges_to_add:
-        result.add_edge(edge[0], edge[1], edge[2])
-    
-    return result, matching
+def read_base_graph_from_stsh_file(path: str, use_mmap: bool = False) -> tuple[base_graph.BaseGraph, list[int]]:
+    with open(path, 'rb') as file:
+        if not use_mmap:
+            return parse_stsh(file.read())
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return parse_stsh(buffer)
+
+
+def read_base_graph_from_file(path: str, use_mmap: bool = False) -> tuple[base_graph.BaseGraph, list[int]]:
+    """
+    Reads an instance file, either an stsh input or a binary instance (see `binary_format`).
+    With `use_mmap`, an stsh file is parsed from a memory map instead of being read in memory first.
+    """
+    if binary_format.is_binary_instance(path):
+        return binary_format.read_instance(path)
+    return read_base_graph_from_stsh_file(path, use_mmap)
+
+
+def read_base_graph_from_stsh_input() -> tuple[base_graph.BaseGraph, list[int]]:
+    """
+    Reads an stsh input from standard input, see `parse_stsh`.
+    """
+    return parse_stsh(sys.stdin.buffer.read())
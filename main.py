@@ -1,9 +1,16 @@
+import argparse
+import json
+import os
+import sys
+
 import input_parsing
-import dependency_graph
+import binary_format
 import solver
-import base_graph
-
-solver.VERBOSE = True
+import decomposition
+import heuristics
+import metrics
+import reductions
+import certificate
 
 """
 Python implementation of Stallmann's algorithm for Graphic Matroid Parity
@@ -11,20 +18,157 @@ Python implementation of Stallmann's algorithm for Graphic Matroid Parity
 Benjamin Peyrille (Gardes-Sol) - 2022
 """
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Graphic Matroid Parity solver.')
+    parser.add_argument('input', nargs='?', help='instance file, stsh text or binary (default: stsh from stdin)')
+    parser.add_argument('--mmap', action='store_true', help='parse an stsh instance file from a memory map instead of reading it in memory first')
+    parser.add_argument('--to-binary', metavar='PATH', help='write the instance in the binary format and exit')
+    parser.add_argument('--checkpoint', metavar='PATH', help='write the matching after each augmentation, and resume from it if it exists')
+    parser.add_argument('--decompose', action='store_true', help='solve the independent sub-problems separately')
+    parser.add_argument('-j', '--workers', type=int, default=1, help='amount of worker processes for the sub-problems, or for building the dependency graph without --decompose (default: 1)')
+    parser.add_argument('--warm-start', action='store_true', help='extend the initial matching greedily before solving')
+    parser.add_argument('--restarts', type=int, default=0, help='amount of randomized greedy restarts of the warm start')
+    parser.add_argument('--swap-passes', type=int, default=0, help='amount of local swap passes of the warm start')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the randomized warm start and of the algebraic size')
+    parser.add_argument('--time-limit', type=float, default=None, help='stop after this many seconds with the best matching found')
+    parser.add_argument('--max-augmentations', type=int, default=None, help='stop after this many augmentations')
+    parser.add_argument('--stop-at-optimum', action='store_true', help='compute the maximum matching size algebraically first, and skip the final search')
+    parser.add_argument('--size-only', action='store_true', help='print the maximum matching size, computed algebraically, and exit')
+    parser.add_argument('--reduce', action='store_true', help='apply the reduction rules before solving')
+    parser.add_argument('--phases', action='store_true', help='apply several disjoint augmentations per search')
+    parser.add_argument('--engine', choices=['search', 'algebraic'], default='search', help='augmenting path search over the dependency graph, or optional algebraic engine for dense instances only, with at least as many pairs as vertices, needing NumPy, O(n^2) memory and O(m n^2) time for n vertices and m pairs (default: search)')
+    parser.add_argument('--cross-check', action='store_true', help='solve again with the other engine and check that the matching sizes agree')
+    parser.add_argument('--certificate', metavar='PATH', help='write the matching with a certificate bounding its size, when the final search finds no augmenting path')
+    parser.add_argument('--verify', metavar='PATH', help='check a matching and its certificate written by --certificate, and exit')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print every solver event and the dependency graph at each search')
+    parser.add_argument('--stats', action='store_true', help='print the event counters and phase timings as JSON')
+    parser.add_argument('--trace', metavar='PATH', help='write the solver events as JSON lines')
+    arguments = parser.parse_args()
+    if arguments.decompose and arguments.checkpoint:
+        parser.error('--checkpoint cannot be used with --decompose')
+    if arguments.reduce and arguments.checkpoint:
+        parser.error('--checkpoint cannot be used with --reduce')
+    if arguments.certificate and (arguments.decompose or arguments.reduce):
+        parser.error('--certificate cannot be used with --decompose or --reduce')
+    if arguments.engine == 'algebraic' and (arguments.checkpoint or arguments.decompose or arguments.certificate or arguments.time_limit is not None or arguments.max_augmentations is not None):
+        parser.error('--engine algebraic cannot be used with --checkpoint, --decompose, --certificate, --time-limit or --max-augmentations')
+    if arguments.engine == 'algebraic' or arguments.cross_check:
+        # Imported here, as it loads NumPy
+        import algebraic
+        if algebraic.numpy is None:
+            parser.error('--engine algebraic and --cross-check need NumPy')
+    if arguments.decompose and (arguments.stats or arguments.trace):
+        parser.error('--stats and --trace cannot be used with --decompose')
+    if arguments.decompose and (arguments.time_limit is not None or arguments.max_augmentations is not None):
+        parser.error('--time-limit and --max-augmentations cannot be used with --decompose')
+    return arguments
+
 if __name__ == "__main__":
-    graph, matching_ids = input_parsing.read_base_graph_from_stsh_input()
+    arguments = parse_arguments()
+    solver.VERBOSE = arguments.verbose
+    try:
+        if arguments.input is None or arguments.input == '-':
+            graph, matching_ids = input_parsing.read_base_graph_from_stsh_input()
+        else:
+            graph, matching_ids = input_parsing.read_base_graph_from_file(arguments.input, arguments.mmap)
+    except (input_parsing.InputError, binary_format.FormatError) as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+
+    if arguments.to_binary:
+        binary_format.write_instance(arguments.to_binary, graph, matching_ids)
+        sys.exit(0)
+
+    if arguments.size_only:
+        import algebraic
+        print('Maximum matching size:', algebraic.optimum_size(graph, arguments.seed))
+        sys.exit(0)
+
+    if arguments.verify:
+        try:
+            matching_ids, matching_certificate = certificate.read_certificate(arguments.verify, graph)
+            bound = certificate.check(graph, matching_ids, matching_certificate)
+        except certificate.CertificateError as error:
+            print('Invalid:', error, file=sys.stderr)
+            sys.exit(1)
+        print('Matching size:', len(matching_ids), '- certificate bound:', 2 * bound)
+        if bound > len(matching_ids) // 2:
+            print('Valid, not proven maximum')
+            sys.exit(2)
+        print('Valid, proven maximum')
+        sys.exit(0)
 
     print('Input matching size', len(matching_ids))
 
-    dep_graph = dependency_graph.DependencyGraph(graph, matching_ids)
-    sol = solver.Solver(dep_graph)
+    augmentations = 0
+    if arguments.checkpoint and os.path.exists(arguments.checkpoint):
+        try:
+            matching_ids, augmentations = binary_format.read_checkpoint(arguments.checkpoint, graph)
+        except binary_format.FormatError as error:
+            print(error, file=sys.stderr)
+            sys.exit(1)
+        print('Resuming from checkpoint after', augmentations, 'augmentations, matching size', len(matching_ids))
+
+    def on_augment(matching: list[int]):
+        global augmentations, matched
+        # Under --phases, this is called once per phase, and each augmentation of the phase adds one pair
+        augmentations += (len(matching) - matched) // 2
+        matched = len(matching)
+        print('\tIntermediary matching:', matching)
+        if arguments.checkpoint:
+            binary_format.write_checkpoint(arguments.checkpoint, graph, matching, augmentations)
+
+    if arguments.warm_start:
+        matching_ids, saved = heuristics.warm_start(graph, matching_ids, arguments.restarts, arguments.swap_passes, arguments.seed)
+        print('Warm start matching size', len(matching_ids), '- augmentations saved:', saved)
+
+    kernel = None
+    instance = graph
+    if arguments.reduce:
+        kernel = reductions.reduce(graph, matching_ids)
+        print('Reductions:', ', '.join(f'{rule}: {count}' for rule, count in kernel.stats.items()), '- kernel size:', len(kernel.element_ids) // 2, 'pairs')
+        instance, matching_ids = kernel.to_graph(), kernel.matching
+
+    trace = open(arguments.trace, 'w') if arguments.trace else None
+    solver_metrics = metrics.Metrics(trace) if arguments.stats or trace else None
+
+    certificates = []
     print('\tFirst matching:', matching_ids)
-    while sol.improve_matching():
-        matching_ids = dep_graph.get_matching_from_basis()
-        print('\tIntermediary matching:', matching_ids)
-        dep_graph = dependency_graph.DependencyGraph(graph, matching_ids)
-        sol = solver.Solver(dep_graph)
-    
+    matched = len(matching_ids)
+    optimal = True
+    if arguments.decompose:
+        matching_ids = decomposition.solve_decomposed(instance, matching_ids, arguments.workers, phases=arguments.phases, stop_at_optimum=arguments.stop_at_optimum, seed=arguments.seed)
+    elif arguments.engine == 'algebraic':
+        import algebraic
+        matching_ids = algebraic.maximum_matching(instance, arguments.seed, metrics=solver_metrics)
+    else:
+        matching_ids, optimal = solver.solve_anytime(instance, matching_ids, arguments.time_limit, arguments.max_augmentations, on_augment=on_augment, metrics=solver_metrics, phases=arguments.phases, stop_at_optimum=arguments.stop_at_optimum, workers=arguments.workers, on_certificate=certificates.append if arguments.certificate else None, seed=arguments.seed)
+    if trace is not None:
+        trace.close()
+    other_size = None
+    if arguments.cross_check:
+        import algebraic
+        other = solver.solve(instance) if arguments.engine == 'algebraic' else algebraic.maximum_matching(instance, arguments.seed)
+        other_size = len(other)
+    if kernel is not None:
+        matching_ids = kernel.lift(matching_ids)
+        if other_size is not None:
+            other_size += len(kernel.forced)
+
     print('Final matching size:', len(matching_ids))
+    if not optimal:
+        print('Stopped at the algebraic maximum size or budget exhausted, the matching is not proven maximum' if arguments.stop_at_optimum else 'Budget exhausted, the matching is not proven maximum')
     print('Valid' if graph.get_spanning_forest(matching_ids) is not None else 'Invalid')
     print(sorted(matching_ids))
+    if arguments.certificate:
+        if certificates:
+            certificate.write_certificate(arguments.certificate, graph, matching_ids, certificates[0])
+            print('Certificate bound:', 2 * certificates[0].bound(graph))
+        else:
+            print('No certificate, the final search was not done')
+    if arguments.stats:
+        print(json.dumps(solver_metrics.to_dict()))
+    if other_size is not None:
+        print('Cross-check:', 'both engines agree' if other_size == len(matching_ids) else f'the other engine found a matching of size {other_size}')
+        if optimal and other_size != len(matching_ids):
+            sys.exit(1)
@@ -0,0 +1,67 @@
+"""
+Instrumentation of the solver: event counters, maxima, phase timers and an optional JSON lines event trace.
+
+The solver only records events when it is given a Metrics object (or when `solver.VERBOSE` is set),
+so that nothing is computed for them otherwise.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from typing import TextIO
+
+# Field of an event whose maximum (and total) is kept, for each kind of event
+TRACKED_FIELDS = {
+    'blossom': 'size',
+    'search_path': 'length',
+}
+
+
+class Metrics:
+    def __init__(self, trace: TextIO = None):
+        self.counters: dict[str, int] = {}
+        self.totals: dict[str, int] = {}
+        self.maxima: dict[str, int] = {}
+        self.timers: dict[str, float] = {}
+        self.trace = trace
+        self._start = time.perf_counter()
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, kind: str, fields: dict):
+        """
+        Records an event: counts it, updates its tracked field and writes it to the trace.
+        """
+        self.count(kind)
+        field = TRACKED_FIELDS.get(kind)
+        if field is not None:
+            name = f'{kind}_{field}'
+            self.totals[name] = self.totals.get(name, 0) + fields[field]
+            self.maxima[name] = max(self.maxima.get(name, 0), fields[field])
+        if self.trace is not None:
+            event = {'event': kind, 'time': time.perf_counter() - self._start}
+            event.update((key, _to_json_(value)) for key, value in fields.items())
+            self.trace.write(json.dumps(event) + '\n')
+
+    @contextmanager
+    def timer(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[phase] = self.timers.get(phase, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> dict:
+        return {'counters': self.counters, 'totals': self.totals, 'maxima': self.maxima, 'timers': self.timers}
+
+
+def _to_json_(value):
+    """
+    Elements are written as their ids.
+    """
+    if isinstance(value, (list, tuple, set)):
+        return [_to_json_(v) for v in value]
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return getattr(value, 'element_id', str(value))
@@ -0,0 +1,155 @@
+"""
+Reduction rules shrinking an instance before the exact solver runs.
+
+The rules are applied until none of them removes a pair:
+- loop: a pair with a loop is in no matching.
+- parallel: a pair whose two edges have the same endpoints forms a cycle, thus is in no matching.
+- duplicate: pairs with the same endpoints are interchangeable and cannot be in a matching together, one of them is kept.
+- bridge: a pair of two bridges can be added to any matching, thus is in every maximum matching. It is removed
+  and its edges are contracted: the other pairs form a matching with it if and only if they form a forest
+  in the contracted graph.
+"""
+
+from array import array
+
+import base_graph
+import union_find as uf
+import solver
+
+RULES = ['loop', 'parallel', 'duplicate', 'bridge']
+
+
+class Kernel:
+    """
+    The reduced instance: its edges, with vertices renumbered from 0, and the original id of each of its edges.
+    Edge 2k and 2k+1 of the kernel still form a pair. `forced` holds the original ids of the edges of the pairs
+    in every maximum matching, and `stats` the amount of pairs removed by each rule.
+    """
+    def __init__(self):
+        self.tails = array('q')
+        self.heads = array('q')
+        self.element_ids: list[int] = []
+        self.matching: list[int] = []
+        self.forced: list[int] = []
+        self.stats: dict[str, int] = {rule: 0 for rule in RULES}
+
+    def to_graph(self) -> base_graph.BaseGraph:
+        graph = base_graph.BaseGraph()
+        graph.add_edges(self.tails, self.heads)
+        return graph
+
+    def lift(self, matching: list[int]) -> list[int]:
+        """
+        Maps a matching of the kernel back to the original instance, adding the forced pairs.
+        """
+        return sorted([self.element_ids[element_id] for element_id in matching] + self.forced)
+
+
+def _bridges_(edges: dict[int, tuple[int, int]]) -> set[int]:
+    """
+    The bridges of the multigraph given by its edges (id to endpoints), with an iterative lowlink search.
+    A parallel edge is not a bridge, since the lowlink skips the edge used to reach a vertex, not its endpoint.
+    """
+    incidences: dict[int, list[tuple[int, int]]] = {}
+    for edge_id, (u, v) in edges.items():
+        incidences.setdefault(u, []).append((v, edge_id))
+        incidences.setdefault(v, []).append((u, edge_id))
+
+    order: dict[int, int] = {}
+    low: dict[int, int] = {}
+    bridges: set[int] = set()
+    for root in incidences:
+        if root in order:
+            continue
+        order[root] = low[root] = len(order)
+        # Vertex, edge it was reached through, position in its incidences
+        stack = [(root, None, 0)]
+        while len(stack) > 0:
+            v, via, i = stack[-1]
+            if i < len(incidences[v]):
+                stack[-1] = (v, via, i + 1)
+                w, edge_id = incidences[v][i]
+                if edge_id == via:
+                    continue
+                if w in order:
+                    low[v] = min(low[v], order[w])
+                else:
+                    order[w] = low[w] = len(order)
+                    stack.append((w, edge_id, 0))
+            else:
+                stack.pop()
+                if len(stack) > 0:
+                    parent = stack[-1][0]
+                    low[parent] = min(low[parent], low[v])
+                    if low[v] > order[parent]:
+                        bridges.add(via)
+    return bridges
+
+
+def reduce(graph: base_graph.BaseGraph, matching: list[int] = None) -> Kernel:
+    """
+    Applies the reduction rules until none of them applies, restricting the initial matching to the kernel.
+    """
+    kernel = Kernel()
+    edges = graph.elements
+    contracted = list(range(graph.vertex_count))
+    rank = [0] * graph.vertex_count
+    pairs = set(range(len(edges) // 2))
+    in_matching = {element_id // 2 for element_id in matching} if matching else set()
+
+    def endpoints(element_id: int) -> tuple[int, int]:
+        u, v = uf.uf_find(contracted, edges[element_id][0]), uf.uf_find(contracted, edges[element_id][1])
+        return (u, v) if u <= v else (v, u)
+
+    changed = True
+    while changed:
+        changed = False
+        kept: dict[tuple, int] = {}
+        for pair in sorted(pairs):
+            e1, e2 = endpoints(2*pair), endpoints(2*pair+1)
+            if e1[0] == e1[1] or e2[0] == e2[1]:
+                rule = 'loop'
+            elif e1 == e2:
+                rule = 'parallel'
+            elif min(e1, e2) + max(e1, e2) in kept:
+                rule = 'duplicate'
+                # The pair kept replaces this one in the initial matching
+                if pair in in_matching:
+                    in_matching.add(kept[min(e1, e2) + max(e1, e2)])
+            else:
+                kept[min(e1, e2) + max(e1, e2)] = pair
+                continue
+            pairs.remove(pair)
+            kernel.stats[rule] += 1
+            changed = True
+
+        bridges = _bridges_({element_id: endpoints(element_id) for pair in pairs for element_id in (2*pair, 2*pair+1)})
+        forced = [pair for pair in sorted(pairs) if 2*pair in bridges and 2*pair+1 in bridges]
+        for pair in forced:
+            for element_id in (2*pair, 2*pair+1):
+                uf.uf_union(contracted, edges[element_id][0], edges[element_id][1], rank)
+            pairs.remove(pair)
+            kernel.forced += [2*pair, 2*pair+1]
+            kernel.stats['bridge'] += 1
+            changed = True
+
+    vertices: dict[int, int] = {}
+    for pair in sorted(pairs):
+        for element_id in (2*pair, 2*pair+1):
+            u, v = uf.uf_find(contracted, edges[element_id][0]), uf.uf_find(contracted, edges[element_id][1])
+            kernel.tails.append(vertices.setdefault(u, len(vertices)))
+            kernel.heads.append(vertices.setdefault(v, len(vertices)))
+            if pair in in_matching:
+                kernel.matching.append(len(kernel.element_ids))
+            kernel.element_ids.append(element_id)
+    kernel.forced.sort()
+    return kernel
+
+
+def solve_reduced(graph: base_graph.BaseGraph, matching: list[int] = None, **options) -> tuple[list[int], dict[str, int]]:
+    """
+    Computes a maximum matching by solving the kernel of the graph, the options being passed to `solver.solve`.
+    Returns it with the amount of pairs removed by each rule.
+    """
+    kernel = reduce(graph, matching)
+    return kernel.lift(solver.solve(kernel.to_graph(), kernel.matching, **options)), kernel.stats
@@ -1,5 +1,16 @@
+import contextlib
+import itertools
+import time
+import warnings
+from array import array
+from collections import deque
+
 import dependency_graph as dg
 import base_graph as bg
+import union_find as uf
+import heuristics
+import metrics as mt
+import certificate
 
 UNLABELED_SER = 99999999
 NO_BLOSSOM = -1
@@ -7,50 +18,157 @@ NO_BLOSSOM = -1
 VERBOSE = False
 
 class Transform(dg.Element):
+    __slots__ = ('bud', 'tip1', 'tip2')
+
     def __init__(self, tip1: dg.Element, tip2: dg.Element, bud: dg.Element):
         super().__init__(None)
         self.pair = tip1.pair
+        self.is_transform = True
 
         self.bud = bud
         self.tip1 = tip1
         self.tip2 = tip2
         self.edge = (tip1, tip2)
 
-class Property:
-    def __init__(self, element: dg.Element):
-        self.element = element
-
-        self.serial: int = UNLABELED_SER
-        self.previous: dg.Element = None
-        self.reverse: dg.Element = None
-        self.blossom_id = NO_BLOSSOM
-        self.is_tip = False
+# Messages printed for the events when VERBOSE
+MESSAGES = {
+    'improve': 'Improving matching: {basis}',
+    'singleton': '\tLabelling singleton {element}',
+    'scan': '\tScanning element {element}',
+    'label_step': '\t\tLabel step/ {element}',
+    'degenerate_blossom_step': '\t\tDegenerate blossom step/ bud: {bud} x1: {x1} x2: {x2}',
+    'blossom_step': '\t\tBlossom step/ bud: {bud} x1: {x1} x2: {x2}',
+    'augment_step': '\t\tAugment step/ {x1} {x2}',
+    'label': '\t\t\tLabelled {element} with s: {serial} p: {previous}',
+    'transform': '\t\t\tCreated transform {element}\n\t\t\t  with adj: {adjacency}',
+    'blossom': '\t\t\tCreated blossom: {elements}',
+}
 
+class Solver:
+    def __init__(self, dep_graph: dg.DependencyGraph, metrics: mt.Metrics = None, deadline: float = None):
+        self.dep_graph = dep_graph
+        self.metrics = metrics
+        # Searches are interrupted once time.perf_counter() passes the deadline
+        self.deadline = deadline
+        self.interrupted = False
+        # Events are only built when they are printed or recorded
+        self.instrumented = VERBOSE or metrics is not None
+        self.reset()
 
-def log(*args, **kwargs):
-    if VERBOSE:
-        print(*args, **kwargs)
+    def _record_(self, kind: str, **fields):
+        if VERBOSE and kind in MESSAGES:
+            print(MESSAGES[kind].format(**fields))
+        if self.metrics is not None:
+            self.metrics.record(kind, fields)
 
-class Solver:
-    def __init__(self, dep_graph: dg.DependencyGraph):
+    def reset(self):
+        """
+        Clears the search state, to be used after the dependency graph was updated.
+        """
         self.next_serial: int = 0
-        self.next_element_id: int = max(dep_graph.elements.keys()) + 1
-        self.next_blossom_id: int = 0
-        self.blossoms: list[set[dg.Element]] = []
+        self.next_element_id: int = max(self.dep_graph.elements.keys(), default=-1) + 1
+        # Blossoms are kept in a union-find structure over blossom ids, the representative holding the tips
+        self.blossom_set: list[int] = []
+        self.blossom_rank: list[int] = []
+        self.blossom_size: list[int] = []
+        self.blossom_tips: list[list[dg.Element]] = []
+        # Element, bud and whether it is degenerate of each blossom, in creation order, for `dual_certificate`
+        self.blossom_buds: list[tuple[dg.Element, dg.Element, bool]] = []
 
-        self.dep_graph = dep_graph
+        # Search state of the elements, indexed by element id
+        # (blossom_id is the blossom an element was first merged into, see `_blossom_of_`)
+        self.serial: array = array('q')
+        self.previous: list[dg.Element] = []
+        self.reverse: list[dg.Element] = []
+        self.blossom_id: array = array('q')
+        self.is_tip: bytearray = bytearray()
+        self._grow_(self.next_element_id)
+
+        self.queue: deque[dg.Element] = deque()
+        # Labelled elements, in label order, and whether the search was resumed from a previous one (see `resume`)
+        self.labelled: list[dg.Element] = []
+        self.resumed = False
+        # Memoized search path prefixes, without and with detransformation
+        self.path_prefixes: dict[bool, dict[int, list[dg.Element]]] = {False: {}, True: {}}
+
+    def _grow_(self, size: int):
+        """
+        Extends the search state columns to hold the elements with an id below size.
+        """
+        missing = size - len(self.serial)
+        if missing <= 0:
+            return
+        self.serial.extend([UNLABELED_SER] * missing)
+        self.previous.extend([None] * missing)
+        self.reverse.extend([None] * missing)
+        self.blossom_id.extend([NO_BLOSSOM] * missing)
+        self.is_tip.extend(bytes(missing))
 
-        self.elem_properties: dict[dg.Element, Property] = {elem: Property(elem) for elem in self.dep_graph.elements.values()}
+    def resume(self):
+        """
+        Clears the search state after the dependency graph was rebased, except for the search trees left untouched.
 
-        self.queue: list[dg.Element] = []
+        A tree is kept if it has no blossom, and neither its elements nor their pairs were exchanged
+        or had their adjacency changed (see `DependencyGraph.rebase`). Its elements keep their labels,
+        and those already scanned are scanned again if they are adjacent to an element of a discarded tree.
+        A resumed search finding no augmenting path does not prove the matching maximum, so it is then redone from scratch.
+        """
+        changed = self.dep_graph.changed_elements
+        if changed is None:
+            self.reset()
+            return
+        serial, previous, blossom_id, is_tip = self.serial, self.previous, self.blossom_id, self.is_tip
+        elements = self.dep_graph.elements
+
+        # Root singleton of the tree of each labelled element, labelled before it
+        root: dict[int, int] = {}
+        discarded: set[int] = set()
+        for e in self.labelled:
+            eid = e.element_id
+            p = previous[eid]
+            if p is None:
+                root[eid] = eid
+            elif p.element_id in root:
+                root[eid] = root[p.element_id]
+            else:
+                self.reset()
+                return
+            pair = e.pair
+            if (e.is_transform or elements.get(eid) is not e or e in changed or blossom_id[eid] != NO_BLOSSOM or is_tip[eid]
+                    or (pair is not None and (pair in changed or blossom_id[pair.element_id] != NO_BLOSSOM))):
+                discarded.add(root[eid])
+
+        unscanned = set(self.queue)
+        kept = [e for e in self.labelled if root[e.element_id] not in discarded]
+        if not kept:
+            self.reset()
+            return
+        removed = {a for e in self.labelled if root[e.element_id] in discarded for a in (e, e.pair) if a is not None}
+        states = [(e, serial[e.element_id], previous[e.element_id], self.reverse[e.element_id]) for e in kept]
+        next_serial = self.next_serial
+
+        self.reset()
+        self.resumed = True
+        self.next_serial = next_serial
+        for e, s, p, r in states:
+            self.serial[e.element_id] = s
+            self.previous[e.element_id] = p
+            self.reverse[e.element_id] = r
+            self.labelled.append(e)
+            if e in unscanned or any(a in removed for a in e.adjacency):
+                self.queue.append(e)
+        if self.metrics is not None:
+            self.metrics.count('kept_labels', len(kept))
 
     def _label_(self, elem: dg.Element, previous: dg.Element, reverse: dg.Element = None):
-        self.elem_properties[elem].serial = self.next_serial
+        self.serial[elem.element_id] = self.next_serial
         self.next_serial += 1
-        self.elem_properties[elem].previous = previous
-        self.elem_properties[elem].reverse = reverse
+        self.previous[elem.element_id] = previous
+        self.reverse[elem.element_id] = reverse
         self.queue.append(elem)
-        log('\t\t\tLabelled',elem,'with s:',self.next_serial-1, 'p:', previous)
+        self.labelled.append(elem)
+        if self.instrumented:
+            self._record_('label', element=elem, serial=self.next_serial-1, previous=previous)
 
     def _compute_transform_(self, bud: dg.Element, tip1: dg.Element, tip2: dg.Element):
         x = Transform(tip1, tip2, bud)
@@ -59,93 +177,184 @@ class Solver:
         self.dep_graph.add_element(self.next_element_id, x)
         self.next_element_id += 1
         
-        for a in tip1.adjacency:
-            if a in tip2.adjacency:
-                continue
-            self.dep_graph.make_adjacent(x, a)
-        for a in tip2.adjacency:
-            if a in tip1.adjacency:
-                continue
+        for a in self.dep_graph.symmetric_difference(tip1, tip2):
             self.dep_graph.make_adjacent(x, a)
         
-        self.elem_properties[x] = Property(x)
-        log('\t\t\tCreated transform', x)
-        log('\t\t\t  with adj:', ' '.join([str(e) for e in x.adjacency]))
+        self._grow_(self.next_element_id)
+        if self.instrumented:
+            self._record_('transform', element=x, adjacency=' '.join([str(e) for e in x.adjacency]))
         return x
     
+    def _blossom_of_(self, elem: dg.Element) -> int:
+        """
+        The representative of the blossom containing elem, or NO_BLOSSOM.
+        """
+        blossom = self.blossom_id[elem.element_id]
+        if blossom == NO_BLOSSOM:
+            return NO_BLOSSOM
+        return uf.uf_find(self.blossom_set, blossom)
+
+    def _union_blossoms_(self, blossom1: int, blossom2: int) -> int:
+        blossom1 = uf.uf_find(self.blossom_set, blossom1)
+        blossom2 = uf.uf_find(self.blossom_set, blossom2)
+        if blossom1 == blossom2:
+            return blossom1
+        uf.uf_union(self.blossom_set, blossom1, blossom2, self.blossom_rank)
+        root, child = (blossom2, blossom1) if self.blossom_set[blossom1] == blossom2 else (blossom1, blossom2)
+        self.blossom_tips[root] += self.blossom_tips[child]
+        self.blossom_size[root] += self.blossom_size[child]
+        self.blossom_tips[child] = []
+        return root
+
+    def _set_tip_(self, elem: dg.Element):
+        self.is_tip[elem.element_id] = 1
+        blossom = self._blossom_of_(elem)
+        if blossom != NO_BLOSSOM:
+            self.blossom_tips[blossom].append(elem)
+
+    def _clear_tips_(self, blossom: int):
+        for e in self.blossom_tips[blossom]:
+            self.is_tip[e.element_id] = 0
+        self.blossom_tips[blossom] = []
+
     def _merge_into_blossom_(self, ebunch: list[dg.Element]):
-        new_blossom: set[dg.Element] = set(ebunch)
-        blossoms_to_merge = [self.elem_properties[e].blossom_id for e in ebunch if self.elem_properties[e].blossom_id != NO_BLOSSOM]
-        for e in ebunch:
-            self.elem_properties[e].blossom_id = self.next_blossom_id
+        new_blossom = len(self.blossom_set)
+        self.blossom_set.append(new_blossom)
+        self.blossom_rank.append(0)
+        self.blossom_size.append(0)
+        self.blossom_tips.append([])
 
-        for blossom in blossoms_to_merge:
-            for e, p in self.elem_properties.items():
-                if p.blossom_id == blossom:
-                    new_blossom.add(e)
-                    p.blossom_id = self.next_blossom_id
+        for e in ebunch:
+            if self.blossom_id[e.element_id] == NO_BLOSSOM:
+                self.blossom_id[e.element_id] = new_blossom
+                self.blossom_size[uf.uf_find(self.blossom_set, new_blossom)] += 1
+                if self.is_tip[e.element_id]:
+                    self.blossom_tips[uf.uf_find(self.blossom_set, new_blossom)].append(e)
+            else:
+                self._union_blossoms_(self.blossom_id[e.element_id], new_blossom)
         
-        self.next_blossom_id += 1
-        log('\t\t\tCreated blossom:',new_blossom)
-        self.blossoms.append(new_blossom)
+        if self.instrumented:
+            blossom = uf.uf_find(self.blossom_set, new_blossom)
+            self._record_('blossom', elements=ebunch, size=self.blossom_size[blossom])
         
 
     def _compute_degenerate_blossom_(self, bud: dg.Element, tip1: dg.Element, tip2: dg.Element):
         x = self._compute_transform_(bud, tip1, tip2)
         self._merge_into_blossom_([tip1, tip2, x])
-        self.elem_properties[tip1].is_tip = True
-        self.elem_properties[tip2].is_tip = True
+        self.blossom_buds.append((tip1, bud, True))
+        self._set_tip_(tip1)
+        self._set_tip_(tip2)
         self._label_(x, bud)
 
 
-    def _compute_search_path_(self, elem: dg.Element, detransform=False) -> list[dg.Element]:
-        props = self.elem_properties[elem]
-        if not isinstance(elem, Transform):
-            if props.previous is None:
-                return [elem]
-            if props.reverse is not None:
-                rev_path = self._compute_search_path_(props.reverse, detransform)
-                rev_path = list(reversed(rev_path[:rev_path.index(elem)+1]))
-                return rev_path + self._compute_search_path_(props.previous, detransform)
+    def _compute_path_prefix_(self, elem: dg.Element, detransform=False) -> list[dg.Element]:
+        """
+        The search path of elem is its prefix followed by the search path of its previous element.
+        Prefixes only depend on labels, which are not modified during a search, so they are memoized.
+        They are computed iteratively: a prefix depending on a missing one is put back on the stack.
+        """
+        prefixes = self.path_prefixes[detransform]
+        stack = [elem]
+        while len(stack) > 0:
+            e = stack[-1]
+            if e.element_id in prefixes:
+                stack.pop()
+                continue
+            previous = self.previous[e.element_id]
+            reverse = self.reverse[e.element_id]
+            first = e.tip1 if detransform and isinstance(e, Transform) else e
+
+            if previous is None:
+                prefixes[e.element_id] = [e]
+                stack.pop()
+                continue
+            if reverse is None:
+                prefixes[e.element_id] = [first, e.pair]
+                stack.pop()
+                continue
+            
+            # The reversed search path of the reverse element, up to e (up to the first tip excluded for a transform)
+            target = e.tip1 if isinstance(e, Transform) else e
+            rev_path: list[dg.Element] = []
+            x = reverse
+            while x is not None:
+                prefix = prefixes.get(x.element_id)
+                if prefix is None:
+                    stack.append(x)
+                    break
+                if target in prefix:
+                    rev_path += prefix[:prefix.index(target)+1]
+                    break
+                rev_path += prefix
+                x = self.previous[x.element_id]
             else:
-                return [elem, elem.pair] + self._compute_search_path_(props.previous, detransform)
-        else:
-            if props.reverse is None:
-                return [elem.tip1 if detransform else elem, elem.pair] + self._compute_search_path_(props.previous, detransform)
+                raise RuntimeError('element not found in the search path of its reverse pointer', e)
+            if stack[-1] is not e:
+                continue
+            
+            rev_path.reverse()
+            if isinstance(e, Transform):
+                prefixes[e.element_id] = [first] + rev_path[1:]
             else:
-                rev_path = self._compute_search_path_(props.reverse, detransform)
-                rev_path = list(reversed(rev_path[:rev_path.index(elem.tip1)]))
-                return [elem.tip1 if detransform else elem] + rev_path + self._compute_search_path_(props.previous, detransform)
+                prefixes[e.element_id] = rev_path
+            stack.pop()
+        return prefixes[elem.element_id]
 
-    def _compute_primitive_bud_(self, elem1: dg.Element, elem2: dg.Element):
-        path1 = self._compute_search_path_(elem1)
-        path2 = self._compute_search_path_(elem2)
+    def _compute_search_path_(self, elem: dg.Element, detransform=False) -> list[dg.Element]:
+        path: list[dg.Element] = []
+        while elem is not None:
+            path += self._compute_path_prefix_(elem, detransform)
+            elem = self.previous[elem.element_id]
+        if self.instrumented:
+            self._record_('search_path', length=len(path))
+        return path
 
+    def _compute_primitive_bud_(self, path1: list[dg.Element], path2: list[dg.Element]):
+        """
+        The first element of path1 that is in path2, or whose blossom contains an element of path2.
+        """
+        path2_ids = {x.element_id for x in path2}
+        path2_blossoms = {self._blossom_of_(x) for x in path2}
         for b in path1:
-            blossom = None if self.elem_properties[b].blossom_id == NO_BLOSSOM else self.blossoms[self.elem_properties[b].blossom_id]
-            for x in path2:
-                if blossom is None:
-                    if b == x:
-                        return b
-                elif x in blossom:
+            blossom = self._blossom_of_(b)
+            if blossom == NO_BLOSSOM:
+                if b.element_id in path2_ids:
                     return b
+            elif blossom in path2_blossoms:
+                return b
         return None
 
-    def _augment_(self, elem1: dg.Element, elem2: dg.Element):
+    def _compute_augmenting_path_(self, elem1: dg.Element, elem2: dg.Element) -> list[dg.Element]:
         path1 = self._compute_search_path_(elem1, detransform=True)
         path2 = self._compute_search_path_(elem2, detransform=True)
-        for e in path1 + path2:
-            if e.is_in_basis:
-                e.is_in_basis = False
-                self.dep_graph.basis.remove(e)
-            else:
-                e.is_in_basis = True
-                self.dep_graph.basis.append(e)
+        return path1 + path2
+
+    def _augment_(self, elem1: dg.Element, elem2: dg.Element):
+        self.dep_graph.exchange(self._compute_augmenting_path_(elem1, elem2))
+
+    def _is_valid_exchange_(self, ebunch: list[dg.Element]) -> bool:
+        """
+        Checks that exchanging the given elements gives a matching: pairs are exchanged together and the basis is still a forest.
+        """
+        exchanged = set(ebunch)
+        return all(e.pair is None or e.pair in exchanged for e in exchanged) and self._is_independent_(ebunch)
+
+    def _is_independent_(self, ebunch: list[dg.Element]) -> bool:
+        """
+        Checks that exchanging the given elements with respect to the basis still gives a forest.
+        """
+        exchanged = set(ebunch)
+        uf_set = list(range(self.dep_graph.graph.vertex_count))
+        rank = [0] * len(uf_set)
+        for e in itertools.chain((e for e in self.dep_graph.basis if e not in exchanged), (e for e in exchanged if not e.is_in_basis)):
+            u, v = uf.uf_find(uf_set, e.edge[0]), uf.uf_find(uf_set, e.edge[1])
+            if u == v:
+                return False
+            uf.uf_union(uf_set, u, v, rank)
+        return True
 
-    def _blossom_(self, elem1: dg.Element, elem2: dg.Element, root_bud: dg.Element):
-        bud_blossom = self.elem_properties[root_bud].blossom_id
-        path1 = self._compute_search_path_(elem1)
-        path2 = self._compute_search_path_(elem2)
+    def _blossom_(self, elem1: dg.Element, elem2: dg.Element, root_bud: dg.Element, path1: list[dg.Element], path2: list[dg.Element]):
+        bud_blossom = self._blossom_of_(root_bud)
 
         bud1: dg.Element = None
         bud2: dg.Element = None
@@ -153,12 +362,12 @@ class Solver:
         bud2_index: int = -1
 
         for i, e in enumerate(path1):
-            if (bud_blossom != NO_BLOSSOM and self.elem_properties[e].blossom_id == bud_blossom) or e == root_bud:
+            if (bud_blossom != NO_BLOSSOM and self._blossom_of_(e) == bud_blossom) or e == root_bud:
                 bud1 = e
                 bud1_index = i
                 break
         for i, e in enumerate(path2):
-            if (bud_blossom != NO_BLOSSOM and self.elem_properties[e].blossom_id == bud_blossom) or e == root_bud:
+            if (bud_blossom != NO_BLOSSOM and self._blossom_of_(e) == bud_blossom) or e == root_bud:
                 bud2 = e
                 bud2_index = i
                 break
@@ -174,36 +383,32 @@ class Solver:
         for i, e in enumerate(path1):
             if e == tip1 or e == bud1:
                 break
-            e_p = self.elem_properties[e]
-            if e_p.serial != UNLABELED_SER:
+            if self.serial[e.element_id] != UNLABELED_SER:
                 continue
-            if e_p.blossom_id != NO_BLOSSOM and not e_p.is_tip:
+            if self.blossom_id[e.element_id] != NO_BLOSSOM and not self.is_tip[e.element_id]:
                 continue
             #previous = elem2 if i <= 1 else path1[i-2]
-            to_label[e] = (self.elem_properties[e.pair].serial, elem1, elem2)
+            to_label[e] = (self.serial[e.pair.element_id], elem1, elem2)
         for e in path2:
             if e == tip2 or e == bud2:
                 break
-            e_p = self.elem_properties[e]
-            if e_p.serial != UNLABELED_SER:
+            if self.serial[e.element_id] != UNLABELED_SER:
                 continue
-            if e_p.blossom_id != NO_BLOSSOM and not e_p.is_tip:
+            if self.blossom_id[e.element_id] != NO_BLOSSOM and not self.is_tip[e.element_id]:
                 continue
             #previous = elem1 if i <= 1 else path2[i-2]
-            to_label[e] = (self.elem_properties[e.pair].serial, elem2, elem1)
+            to_label[e] = (self.serial[e.pair.element_id], elem2, elem1)
         
         label_list = sorted(to_label.keys(), reverse=True, key=lambda e: to_label[e][0])
 
         for g in label_list:
-            g_p = self.elem_properties[g]
-            if g_p.blossom_id != NO_BLOSSOM and not g_p.is_tip:
+            g_id = g.element_id
+            if self.blossom_id[g_id] != NO_BLOSSOM and not self.is_tip[g_id]:
                 continue
             self._label_(g, to_label[g][2], reverse=to_label[g][1])
-            if g_p.is_tip:
-                g_p.is_tip = False
-                for e in self.elem_properties.keys():
-                    if self.elem_properties[e].blossom_id == g_p.blossom_id:
-                        self.elem_properties[e].is_tip = False
+            if self.is_tip[g_id]:
+                self.is_tip[g_id] = 0
+                self._clear_tips_(self._blossom_of_(g))
         
         # The new blossom always contains x1 and x2
         new_blossom = [elem1, elem2]
@@ -221,48 +426,429 @@ class Solver:
                 break
             new_blossom.append(e)
         if tip1 is not None:
-            self.elem_properties[tip1].is_tip = True
-            self.elem_properties[tip2].is_tip = True
+            self._set_tip_(tip1)
+            self._set_tip_(tip2)
         
         self._merge_into_blossom_(new_blossom)
+        self.blossom_buds.append((elem1, root_bud, False))
 
-    def improve_matching(self):
-        log('Improving matching:', self.dep_graph.basis)
+    def _scan_order_(self, adjacency: list[dg.Element]) -> list[dg.Element]:
+        """
+        The adjacency in the order it is scanned: labeled elements by serial, then unlabeled elements in adjacency order.
+        Only the labeled elements, usually a few, are sorted.
+        """
+        serial = self.serial
+        labeled = [a for a in adjacency if serial[a.element_id] != UNLABELED_SER]
+        labeled.sort(key=lambda e: serial[e.element_id])
+        return labeled + [a for a in adjacency if serial[a.element_id] == UNLABELED_SER]
+
+    def improve_matching(self, phase: bool = False, max_augmentations: int = None) -> int:
+        """
+        Searches for an augmenting path and applies it to the basis.
+        Returns the amount of augmentations applied, 0 if the matching is maximum.
+
+        With `phase`, the search is not stopped at the first augmenting path: it goes on without the elements
+        of the paths already found, collecting the paths that can be applied together (their pairs are disjoint
+        and the exchanged basis is still a forest), which are then all applied at once, at most `max_augmentations`.
+
+        If the deadline passes, the search stops and sets `interrupted`: the paths already found are applied,
+        but a return value of 0 does not mean the matching is maximum anymore.
+        """
+        # Elements of the augmenting paths found in this phase
+        used: set[dg.Element] = set()
+        found: list[dg.Element] = []
+        augmentations = 0
+
+        if self.instrumented:
+            self._record_('improve', basis=self.dep_graph.basis)
         if VERBOSE:
             print(self.dep_graph)
-        # We label all singletons
+        # We label all singletons, except those of the trees kept by `resume`
         for singleton_id in self.dep_graph.singletons:
+            if self.serial[singleton_id] != UNLABELED_SER:
+                continue
             singleton = self.dep_graph.elements[singleton_id]
-            log('\tLabelling singleton', singleton)
+            if self.instrumented:
+                self._record_('singleton', element=singleton)
             self._label_(singleton, None)
 
+        serial = self.serial
+        blossom_id = self.blossom_id
+        deadline = self.deadline
         while len(self.queue) > 0:
-            current = self.queue.pop(0)
-            current.adjacency.sort(key=lambda e: self.elem_properties[e].serial)
-            log('\tScanning element', current)
+            if deadline is not None and time.perf_counter() > deadline:
+                self.interrupted = True
+                break
+            if augmentations == max_augmentations:
+                break
+            current = self.queue.popleft()
+            if current in used:
+                continue
+            current_id = current.element_id
+            adjacency = current.adjacency
+            members = None
+            if self.instrumented:
+                self._record_('scan', element=current)
 
-            for adjacent in current.adjacency:
+            for adjacent in self._scan_order_(adjacency):
+                if used and (current in used or adjacent in used):
+                    continue
+                adjacent_id = adjacent.element_id
                 # If the adjacent is equivalent to the current
-                if self.elem_properties[adjacent].blossom_id != NO_BLOSSOM and self.elem_properties[adjacent].blossom_id == self.elem_properties[current].blossom_id:
+                if blossom_id[adjacent_id] != NO_BLOSSOM and self._blossom_of_(adjacent) == self._blossom_of_(current):
                     continue
 
-                if self.elem_properties[adjacent].serial != UNLABELED_SER and self.elem_properties[adjacent].serial < self.elem_properties[current].serial:
-                    bud = self._compute_primitive_bud_(current, adjacent)
+                if serial[adjacent_id] != UNLABELED_SER and serial[adjacent_id] < serial[current_id]:
+                    path1 = self._compute_search_path_(current)
+                    path2 = self._compute_search_path_(adjacent)
+                    bud = self._compute_primitive_bud_(path1, path2)
                     if bud is None:
-                        log('\t\tAugment step/', current, adjacent)
-                        self._augment_(current, adjacent)
-                        return True
+                        if self.instrumented:
+                            self._record_('augment_step', x1=current, x2=adjacent)
+                        if not phase and not self.resumed:
+                            self._augment_(current, adjacent)
+                            return 1
+                        path = self._compute_augmenting_path_(current, adjacent)
+                        if not phase:
+                            if self._is_valid_exchange_(path):
+                                self.dep_graph.exchange(path)
+                                return 1
+                            # The kept trees were inconsistent with the new basis
+                            if self.metrics is not None:
+                                self.metrics.count('invalid_resume')
+                            self.dep_graph.discard_transforms()
+                            self.reset()
+                            return self.improve_matching(phase, max_augmentations)
+                        if all(e not in used and (e.pair is None or e.pair not in used) for e in path) and self._is_valid_exchange_(found + path):
+                            found += path
+                            used.update(path)
+                            augmentations += 1
                     else:
-                        log('\t\tBlossom step/ bud:', bud, 'x1:', current, 'x2:', adjacent)
-                        self._blossom_(current, adjacent, bud)
+                        if self.instrumented:
+                            self._record_('blossom_step', bud=bud, x1=current, x2=adjacent)
+                        self._blossom_(current, adjacent, bud, path1, path2)
                 
-                elif self.elem_properties[adjacent].serial == UNLABELED_SER and self.elem_properties[adjacent.pair].serial == UNLABELED_SER and self.elem_properties[adjacent].blossom_id == NO_BLOSSOM:
+                elif serial[adjacent_id] == UNLABELED_SER and serial[adjacent.pair.element_id] == UNLABELED_SER and blossom_id[adjacent_id] == NO_BLOSSOM:
                     adjacent_pair = adjacent.pair
-                    if adjacent_pair in current.adjacency:
-                        log('\t\tDegenerate blossom step/ bud:', current, 'x1:', adjacent, 'x2:', adjacent_pair)
+                    if members is None:
+                        members = self.dep_graph.adjacency_members(current, adjacency)
+                    if adjacent_pair.element_id in members:
+                        if self.instrumented:
+                            self._record_('degenerate_blossom_step', bud=current, x1=adjacent, x2=adjacent_pair)
                         self._compute_degenerate_blossom_(current, adjacent, adjacent_pair)
                     else:
-                        log('\t\tLabel step/', adjacent)
+                        if self.instrumented:
+                            self._record_('label_step', element=adjacent)
                         self._label_(adjacent_pair, current)
-        
-        return False
\ No newline at end of file
+
+        if found:
+            self.dep_graph.exchange(found)
+        elif self.resumed and not self.interrupted:
+            self.dep_graph.discard_transforms()
+            self.reset()
+            return self.improve_matching(phase, max_augmentations)
+        return augmentations
+
+    def dual_certificate(self, graph: bg.BaseGraph) -> certificate.Certificate:
+        """
+        Builds a certificate bounding the matching size from the labelling left by a search finding no augmenting path
+        (see `_dual_partition_`), then tightens it (see `_tighten_classes_` and `certificate.improve`).
+        The partition is derived twice, without and with the identification of the tips of the degenerate blossoms,
+        and the lowest bound is returned, or the bound of the connected components if it is lower.
+        """
+        matched = {e.element_id for e in self.dep_graph.elements.values() if e.is_in_basis and not e.is_meta and not e.is_transform}
+        best = certificate.component_certificate(graph)
+        best_bound = best.bound(graph)
+        for identify in (False, True):
+            if best_bound == len(matched) // 2:
+                break
+            contracted, identified, classes = self._dual_partition_(graph, identify)
+            result = certificate.Certificate([graph.elements[element_id][:2] for element_id in contracted] + identified, classes)
+            if result.bound(graph) > len(matched) // 2:
+                classes = self._tighten_classes_(graph, matched, contracted, identified, classes)
+                result = certificate.Certificate([graph.elements[element_id][:2] for element_id in contracted] + identified, classes)
+                result = certificate.improve(graph, result, self._adjacent_pairs_())
+            if result.bound(graph) < best_bound:
+                best, best_bound = result, result.bound(graph)
+        return best
+
+    def _dual_partition_(self, graph: bg.BaseGraph, identify: bool) -> tuple[list[int], list[tuple[int, int]], list[list[int]]]:
+        """
+        The elements contracted, the pairs of vertices identified and the classes of pairs of a certificate,
+        derived from the final search.
+
+        The inner elements of the basis (unlabelled and in no blossom, their pair being labelled) are contracted.
+        So is the bud of each blossom if it is an outer element out of the basis and of the blossoms, the blossoms
+        sharing a bud joining a class. A degenerate blossom of basis tips whose bud is not such an element gets
+        an outer element of the adjacency of its tips instead, spanned by them but not by the contracted elements.
+        With `identify`, the tips of a degenerate blossom forming a path have its ends identified instead.
+        The pairs of each blossom form a class, each other labelled pair its own class, and the unreached pairs a class.
+        """
+        serial = self.serial
+        edges = graph.elements
+        contracted: list[int] = []
+        identified: list[tuple[int, int]] = []
+        # Union-find over the pair ids, joining the pairs of a blossom, and over the buds as -1 - element id
+        classes: dict[int, int] = {}
+
+        def join(key1: int, key2: int):
+            classes.setdefault(key1, key1)
+            classes.setdefault(key2, key2)
+            uf.uf_union(classes, key1, key2)
+
+        blossom_pairs: dict[int, int] = {}
+        for e in self.dep_graph.elements.values():
+            if e.is_transform or e.is_meta:
+                continue
+            blossom = self._blossom_of_(e)
+            if blossom != NO_BLOSSOM:
+                join(e.pair_id, blossom_pairs.setdefault(blossom, e.pair_id))
+            elif serial[e.element_id] != UNLABELED_SER:
+                classes.setdefault(e.pair_id, e.pair_id)
+            elif serial[e.pair.element_id] != UNLABELED_SER and e.is_in_basis:
+                contracted.append(e.element_id)
+
+        # Union-find over the vertices, Z being contracted
+        vertices = list(range(graph.vertex_count))
+        for element_id in contracted:
+            uf.uf_union(vertices, edges[element_id][0], edges[element_id][1])
+
+        def ends(e: dg.Element) -> tuple[int, int]:
+            return uf.uf_find(vertices, edges[e.element_id][0]), uf.uf_find(vertices, edges[e.element_id][1])
+
+        def is_outer(e: dg.Element) -> bool:
+            return (not e.is_meta and not e.is_transform and not e.is_in_basis and self._blossom_of_(e) == NO_BLOSSOM
+                    and serial[e.element_id] != UNLABELED_SER)
+
+        contracted_ids = set(contracted)
+        pending: list[dg.Element] = []
+        for member, bud, degenerate in self.blossom_buds:
+            if degenerate and identify and not member.is_transform and not member.pair.is_transform:
+                shared = set(edges[member.element_id][:2]) & set(edges[member.pair.element_id][:2])
+                path_ends = set(edges[member.element_id][:2]) ^ set(edges[member.pair.element_id][:2])
+                if len(shared) == 1 and len(path_ends) == 2:
+                    u, v = sorted(path_ends)
+                    identified.append((u, v))
+                    uf.uf_union(vertices, u, v)
+                    continue
+            if degenerate and not member.is_in_basis:
+                continue
+            if is_outer(bud):
+                if bud.element_id not in contracted_ids:
+                    contracted.append(bud.element_id)
+                    contracted_ids.add(bud.element_id)
+                    uf.uf_union(vertices, edges[bud.element_id][0], edges[bud.element_id][1])
+                join(member.pair_id, -1 - bud.element_id)
+            elif degenerate:
+                pending.append(member)
+
+        # An element spanned by the tips, and not by Z, is contracted for each degenerate blossom left,
+        # until none is found, as each contraction changes the span of Z
+        changed = True
+        while changed:
+            changed = False
+            for member in list(pending):
+                local: dict[int, int] = {}
+                for u, v in (ends(member), ends(member.pair)):
+                    local.setdefault(u, u)
+                    local.setdefault(v, v)
+                    uf.uf_union(local, u, v)
+                for y in member.adjacency + member.pair.adjacency:
+                    if not is_outer(y):
+                        continue
+                    u, v = ends(y)
+                    if u != v and u in local and v in local and uf.uf_find(local, u) == uf.uf_find(local, v):
+                        contracted.append(y.element_id)
+                        contracted_ids.add(y.element_id)
+                        uf.uf_union(vertices, u, v)
+                        pending.remove(member)
+                        changed = True
+                        break
+
+        grouped: dict[int, list[int]] = {}
+        unreached: list[int] = []
+        for element_id in edges:
+            if element_id % 2 == 1:
+                continue
+            pair_id = element_id // 2
+            if pair_id in classes:
+                grouped.setdefault(uf.uf_find(classes, pair_id), []).append(pair_id)
+            else:
+                unreached.append(pair_id)
+        return contracted, identified, list(grouped.values()) + ([unreached] if unreached else [])
+
+    def _tighten_classes_(self, graph: bg.BaseGraph, matched: set[int], contracted: list[int], identified: list[tuple[int, int]], classes: list[list[int]]) -> list[list[int]]:
+        """
+        Merges the classes whose bound exceeds what the matching uses of them, floor(r(Z + P) / 2) - floor(r(Z + (M & P)) / 2)
+        with the matching M, so that the certificate is tight if and only if no class has any excess.
+
+        A class with excess is merged with the adjacent class (through the dependency graph, avoiding the contracted
+        elements) lowering the total excess most, or with all of them if none lowers it. Without adjacent class,
+        a contracted element of its pairs is released. Released elements are removed from `contracted`.
+        """
+        edges = graph.elements
+        elements = self.dep_graph.elements
+        vertices, _ = certificate.contract(graph, [edges[element_id][:2] for element_id in contracted] + identified)
+        pair_class: dict[int, int] = {}
+        for pair_ids in classes:
+            for pair_id in pair_ids:
+                pair_class[pair_id] = pair_ids[0]
+        for pair_ids in classes:
+            for pair_id in pair_ids[1:]:
+                uf.uf_union(pair_class, pair_ids[0], pair_id)
+
+        def members() -> dict[int, list[int]]:
+            grouped: dict[int, list[int]] = {}
+            for pair_id in pair_class:
+                grouped.setdefault(uf.uf_find(pair_class, pair_id), []).append(pair_id)
+            return grouped
+
+        def excess(pair_ids: list[int]) -> int:
+            element_ids = certificate.class_elements(pair_ids)
+            return (certificate.class_rank(graph, vertices, element_ids) // 2
+                    - certificate.class_rank(graph, vertices, [element_id for element_id in element_ids if element_id in matched]) // 2)
+
+        changed = True
+        while changed:
+            changed = False
+            groups = members()
+            for root, pair_ids in groups.items():
+                own_excess = excess(pair_ids)
+                if own_excess <= 0:
+                    continue
+                element_ids = certificate.class_elements(pair_ids)
+                contracted_ids = set(contracted)
+                neighbours = {uf.uf_find(pair_class, a.pair_id) for element_id in element_ids for a in elements[element_id].adjacency
+                              if not a.is_meta and not a.is_transform and a.element_id not in contracted_ids}
+                neighbours.discard(root)
+                if neighbours:
+                    best, best_delta = None, 0
+                    for other in sorted(neighbours):
+                        delta = excess(pair_ids + groups[other]) - own_excess - excess(groups[other])
+                        if delta < best_delta:
+                            best, best_delta = other, delta
+                    for other in ([best] if best is not None else neighbours):
+                        uf.uf_union(pair_class, root, other)
+                    changed = True
+                    break
+                released = next((element_id for element_id in element_ids if element_id in contracted_ids), None)
+                if released is not None:
+                    contracted.remove(released)
+                    vertices, _ = certificate.contract(graph, [edges[element_id][:2] for element_id in contracted] + identified)
+                    changed = True
+                    break
+        return list(members().values())
+
+    def _adjacent_pairs_(self) -> set[tuple[int, int]]:
+        """
+        The pairs of pair ids adjacent in the dependency graph.
+        """
+        adjacent: set[tuple[int, int]] = set()
+        for e in self.dep_graph.elements.values():
+            if e.is_meta or e.is_transform:
+                continue
+            for a in e.adjacency:
+                if not a.is_meta and not a.is_transform and a.pair_id != e.pair_id:
+                    adjacent.add((min(e.pair_id, a.pair_id), max(e.pair_id, a.pair_id)))
+        return adjacent
+
+
+def solve_anytime(graph: bg.BaseGraph, matching: list[int] = None, time_limit: float = None, max_augmentations: int = None, incremental: bool = True, on_augment=None, implicit: bool = False, cache_size: int = 0, warm_start: bool = False, metrics: mt.Metrics = None, phases: bool = False, stop_at_optimum: bool = False, preserve_search: bool = True, workers: int = 1, on_certificate=None, seed: int = None, dep_graph: dg.DependencyGraph = None) -> tuple[list[int], bool]:
+    """
+    Computes a matching of the graph as `solve` does, stopping after `time_limit` seconds or `max_augmentations` augmentations.
+    The time limit is checked between the scans of a search, so it is only overrun by the current scan,
+    the dependency graph construction and the warm start.
+
+    With `stop_at_optimum`, the maximum matching size is first computed algebraically (see `algebraic.optimum_size`,
+    seeded with `seed`), and the search stops as soon as the matching reaches it, skipping the final search that finds
+    no augmenting path. The result is then maximum with high probability only, thus not proven maximum. Without NumPy, computing the size usually takes longer
+    than the final search it saves, and a RuntimeWarning is issued.
+    With `preserve_search`, the search trees left untouched by an augmentation are kept for the next search (see `Solver.resume`).
+    The dependency graph is built in `workers` processes if more than one.
+    `on_certificate` is called with a certificate bounding the matching size (see `Solver.dual_certificate`)
+    when the final search finds no augmenting path, thus not with `stop_at_optimum` if it is skipped.
+    `dep_graph` is an existing dependency graph of the graph to start from instead of building one, its basis holding
+    the initial matching (see `dynamic.DynamicSolver`): `matching` and `warm_start` are then ignored,
+    and it is updated in place with `incremental`.
+
+    Returns the best matching found and whether it is proven maximum, that is whether the final search found no augmenting path.
+    """
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    timer = metrics.timer if metrics is not None else lambda phase: contextlib.nullcontext()
+    if dep_graph is not None:
+        matching = dep_graph.get_matching_from_basis()
+    elif warm_start:
+        with timer('warm_start'):
+            matching = heuristics.greedy_matching(graph, matching)
+    if deadline is not None and time.perf_counter() > deadline:
+        return sorted(matching) if matching else [], False
+
+    optimum = None
+    if stop_at_optimum:
+        # Imported here, so that solving without it does not load NumPy
+        import algebraic
+        if algebraic.numpy is None:
+            warnings.warn('stop_at_optimum without NumPy: the pure-Python rank is usually slower than the final search', RuntimeWarning)
+        with timer('algebraic'):
+            optimum = algebraic.optimum_size(graph, seed)
+
+    if dep_graph is None:
+        with timer('dependency_graph'):
+            dep_graph = dg.DependencyGraph(graph, matching, implicit, cache_size, workers)
+    sol = Solver(dep_graph, metrics, deadline)
+    matching = dep_graph.get_matching_from_basis()
+    total = 0
+    if optimum is not None and len(matching) >= optimum:
+        return matching, False
+    while max_augmentations is None or total < max_augmentations:
+        with timer('improve_matching'):
+            augmentations = sol.improve_matching(phases, None if max_augmentations is None else max_augmentations - total)
+        if augmentations:
+            total += augmentations
+            matching = dep_graph.get_matching_from_basis()
+            if metrics is not None:
+                metrics.count('augmentation', augmentations)
+                metrics.count('phase')
+            if on_augment is not None:
+                on_augment(matching)
+        if sol.interrupted:
+            if metrics is not None:
+                metrics.count('interrupted')
+            return matching, False
+        if not augmentations:
+            if on_certificate is not None:
+                on_certificate(sol.dual_certificate(graph))
+            return matching, True
+        if optimum is not None and len(matching) >= optimum:
+            return matching, False
+        if incremental:
+            with timer('rebase'):
+                dep_graph.rebase(graph)
+            if preserve_search:
+                sol.resume()
+            else:
+                sol.reset()
+        else:
+            with timer('dependency_graph'):
+                dep_graph = dg.DependencyGraph(graph, matching, implicit, cache_size, workers)
+            sol = Solver(dep_graph, metrics, deadline)
+    return matching, False
+
+
+def solve(graph: bg.BaseGraph, matching: list[int] = None, incremental: bool = True, on_augment=None, implicit: bool = False, cache_size: int = 0, warm_start: bool = False, metrics: mt.Metrics = None, phases: bool = False, stop_at_optimum: bool = False, preserve_search: bool = True, workers: int = 1, on_certificate=None, seed: int = None, dep_graph: dg.DependencyGraph = None) -> list[int]:
+    """
+    Computes a maximum matching of the graph, starting from the given initial matching,
+    first extended greedily with `warm_start` (see `heuristics.greedy_matching`).
+
+    With `incremental`, the dependency graph is updated in place after each augmentation instead of being rebuilt.
+    `on_augment` is called with the intermediary matching after each augmentation.
+    With `phases`, each search applies several disjoint augmentations at once (see `Solver.improve_matching`),
+    `on_augment` then being called after each phase.
+    `implicit`, `cache_size` and `workers` are passed to the dependency graph.
+    The events and the time spent in each phase are recorded in `metrics`, if given.
+    `stop_at_optimum` skips the final search, using the algebraic size seeded with `seed`, `preserve_search` keeps
+    the untouched search trees, `on_certificate` receives a certificate of the result and `dep_graph` is an existing
+    dependency graph to start from, see `solve_anytime`.
+    """
+    matching, _ = solve_anytime(graph, matching, incremental=incremental, on_augment=on_augment, implicit=implicit, cache_size=cache_size, warm_start=warm_start, metrics=metrics, phases=phases, stop_at_optimum=stop_at_optimum, preserve_search=preserve_search, workers=workers, on_certificate=on_certificate, seed=seed, dep_graph=dep_graph)
+    return matching
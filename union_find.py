@@ -1,10 +1,21 @@
 def uf_find(uf_set: list[int], tag: int):
-    if uf_set[tag] == tag:
-        return tag
-    uf_set[tag] = uf_find(uf_set, uf_set[tag])
-    return uf_set[tag]
+    root = tag
+    while uf_set[root] != root:
+        root = uf_set[root]
+    # Path compression
+    while uf_set[tag] != root:
+        uf_set[tag], tag = root, uf_set[tag]
+    return root
 
-def uf_union(uf_set: list[int], tag1: int, tag2: int):
+def uf_union(uf_set: list[int], tag1: int, tag2: int, rank: list[int] = None):
     tag1 = uf_find(uf_set, tag1)
     tag2 = uf_find(uf_set, tag2)
+    if tag1 == tag2:
+        return
+    if rank is not None:
+        # Union by rank
+        if rank[tag1] > rank[tag2]:
+            tag1, tag2 = tag2, tag1
+        elif rank[tag1] == rank[tag2]:
+            rank[tag2] += 1
     uf_set[tag1] = tag2